@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: bytes written and time per update, legacy backups vs backup store
+
+Builds a throwaway models tree in a temp directory and updates one model
+with each backup strategy:
+  legacy        - copy2 to .bak.<ts>, copy2 to .bak, copy2 source over target
+  store         - engine update (blob hardlinked to the original)
+  store-nolink  - engine update on a filesystem without hardlinks
+                  (blob obtained by renaming the original)
+Results are printed as JSON.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dlss_engine import DLSSUpdaterEngine
+
+MODEL = "dlss"
+DLL_NAME = "nvngx_dlss.dll"
+
+
+def make_tree(base, size):
+    """Create models/dlss/versions/1/files/nvngx_dlss.bin and a source DLL"""
+    files_path = os.path.join(base, "models", MODEL, "versions", "1", "files")
+    os.makedirs(files_path)
+    target = os.path.join(files_path, "nvngx_dlss.bin")
+    source = os.path.join(base, DLL_NAME)
+    for path in (target, source):
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+    return os.path.join(base, "models"), target, source
+
+
+@contextmanager
+def hardlinks_unsupported():
+    """Make os.link fail as it does on filesystems without hardlinks"""
+    real_link = os.link
+
+    def no_link(*args, **kwargs):
+        raise OSError("hardlinks not supported")
+
+    os.link = no_link
+    try:
+        yield
+    finally:
+        os.link = real_link
+
+
+def run_legacy(models_root, target, source):
+    shutil.copy2(target, f"{target}.bak.20000101_000000")
+    shutil.copy2(target, f"{target}.bak")
+    shutil.copy2(source, target)
+    return 3 * os.path.getsize(target)
+
+
+def run_store(models_root, target, source):
+    result = DLSSUpdaterEngine(models_root).update_single_dll(DLL_NAME, source)
+    assert result.success, result.error
+    return result.bytes_written
+
+
+def run_store_nolink(models_root, target, source):
+    with hardlinks_unsupported():
+        return run_store(models_root, target, source)
+
+
+STRATEGIES = {
+    "legacy": run_legacy,
+    "store": run_store,
+    "store-nolink": run_store_nolink,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=64, help='Size of the .bin and DLL')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per strategy')
+    parser.add_argument('--dir', type=str, help='Parent directory for the temp trees')
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    report = {"size_bytes": size, "strategies": {}}
+
+    for name, run in STRATEGIES.items():
+        timings = []
+        bytes_written = 0
+        for _ in range(args.repeat):
+            base = tempfile.mkdtemp(prefix="dlss_bench_", dir=args.dir)
+            try:
+                models_root, target, source = make_tree(base, size)
+                start = time.perf_counter()
+                bytes_written = run(models_root, target, source)
+                timings.append(time.perf_counter() - start)
+            finally:
+                shutil.rmtree(base, ignore_errors=True)
+        report["strategies"][name] = {
+            "bytes_written": bytes_written,
+            "best_seconds": min(timings),
+            "mean_seconds": sum(timings) / len(timings),
+        }
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: engine scan, plan, update, restore and GC on synthetic trees
+
+Each repeat builds a fresh synthetic models tree (see synthetic_tree.py)
+in a temp directory and runs, in order:
+  scan     - resolve_target for every model (version folder walk)
+  plan     - plan_updates for all three DLLs (headers and stats only)
+  update   - update_many, with backups
+  restore  - restore_backups
+  gc       - collect_garbage, keeping the newest --gc-keep-last backups
+Results, including the per-phase step timings and the number of directory
+listings of the last repeat, are printed (or written with --output) as
+JSON so runs can be compared across commits. Runs on Linux; no admin
+rights or GPU needed.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dlss_engine import MODEL_MAP, DLSSUpdaterEngine
+from dlss_profile import PhaseProfiler
+
+from synthetic_tree import build_tree
+
+OPERATIONS = ("scan", "plan", "update", "restore", "gc")
+
+
+def git_revision():
+    """Return the commit being benchmarked, or None outside a git checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_operations(engine, sources, args):
+    """Run every operation once on a fresh tree, returning seconds per operation"""
+    def scan():
+        for model_name in MODEL_MAP.values():
+            assert not engine.resolve_target(model_name).error
+
+    def update():
+        results = engine.update_many(sources, jobs=args.jobs)
+        assert all(result.success for result in results), [result.error for result in results]
+
+    def restore():
+        assert all(result.success for result in engine.restore_backups())
+
+    steps = {
+        "scan": scan,
+        "plan": lambda: engine.plan_updates(sources),
+        "update": update,
+        "restore": restore,
+        "gc": lambda: engine.collect_garbage(keep_last=args.gc_keep_last),
+    }
+    timings = {}
+    for name in OPERATIONS:
+        start = time.perf_counter()
+        steps[name]()
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--versions', type=int, default=5, help='Version folders per model')
+    parser.add_argument('--size-mb', type=float, default=16, help='Size of each .bin and DLL')
+    parser.add_argument('--store-backups', type=int, default=10,
+                        help='Backup store entries per model')
+    parser.add_argument('--legacy-backups', type=int, default=10,
+                        help='Legacy .bin.bak.<timestamp> files per model')
+    parser.add_argument('--backup-size-mb', type=float, default=1, help='Size of each backup')
+    parser.add_argument('--gc-keep-last', type=int, default=3,
+                        help='Backups per model kept by the GC run')
+    parser.add_argument('--jobs', type=int, default=1, help='Parallel updates')
+    parser.add_argument('--repeat', type=int, default=3, help='Fresh trees to run on')
+    parser.add_argument('--dir', type=str, help='Parent directory for the temp trees')
+    parser.add_argument('--output', type=str, help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    size = int(args.size_mb * 1024 * 1024)
+    runs = []
+    profiler = None
+    listings = None
+    for _ in range(args.repeat):
+        base = tempfile.mkdtemp(prefix="dlss_bench_", dir=args.dir)
+        try:
+            models_root, sources = build_tree(base, args.versions, size, args.store_backups,
+                                              args.legacy_backups,
+                                              int(args.backup_size_mb * 1024 * 1024))
+            profiler = PhaseProfiler()
+            engine = DLSSUpdaterEngine(models_root, listener=profiler)
+            runs.append(run_operations(engine, sources, args))
+            listings = engine.tree.scans
+        finally:
+            shutil.rmtree(base, ignore_errors=True)
+
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "tree": {
+            "versions": args.versions,
+            "size_bytes": size,
+            "store_backups": args.store_backups,
+            "legacy_backups": args.legacy_backups,
+            "backup_size_bytes": int(args.backup_size_mb * 1024 * 1024),
+        },
+        "jobs": args.jobs,
+        "repeat": args.repeat,
+        "directory_listings": listings,
+        "operations": {
+            name: {
+                "best_seconds": min(run[name] for run in runs),
+                "mean_seconds": sum(run[name] for run in runs) / len(runs),
+            }
+            for name in OPERATIONS
+        },
+        "phases": [
+            {"model": model, "phase": phase, "calls": calls, "duration_ns": duration_ns,
+             "bytes": moved}
+            for model, phase, calls, duration_ns, moved in (profiler.rows() if profiler else [])
+        ],
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
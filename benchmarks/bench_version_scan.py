@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: find_latest_version over a large versions/ folder
+
+Creates a synthetic versions/ folder holding --count numeric version
+folders (10,000 by default) plus some non-numeric stray files, then times
+the engine's scandir-based find_latest_version against the previous
+listdir + isdir + regex + sort implementation. Results are printed as JSON.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dlss_tree_index import find_latest_version
+
+from synthetic_tree import make_versions_dir
+
+
+def find_latest_version_listdir(versions_path):
+    """The implementation find_latest_version replaced, kept for comparison"""
+    if not os.path.exists(versions_path):
+        return None
+    version_dirs = []
+    for item in os.listdir(versions_path):
+        item_path = os.path.join(versions_path, item)
+        if os.path.isdir(item_path):
+            if re.match(r'^\d+$', item):
+                version_dirs.append((int(item), item_path))
+    if not version_dirs:
+        return None
+    version_dirs.sort(key=lambda x: x[0], reverse=True)
+    return version_dirs[0][1]
+
+
+IMPLEMENTATIONS = {
+    "listdir_sort": find_latest_version_listdir,
+    "scandir_max": find_latest_version,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=10000, help='Numeric version folders')
+    parser.add_argument('--stray', type=int, default=100, help='Non-numeric files alongside')
+    parser.add_argument('--repeat', type=int, default=20, help='Scans per implementation')
+    parser.add_argument('--dir', type=str, help='Parent directory for the temp folder')
+    args = parser.parse_args()
+
+    base = tempfile.mkdtemp(prefix="dlss_bench_", dir=args.dir)
+    try:
+        versions_path = os.path.join(base, "versions")
+        make_versions_dir(versions_path, args.count, args.stray)
+        expected = os.path.join(versions_path, str(args.count))
+
+        report = {"count": args.count, "stray": args.stray, "implementations": {}}
+        for name, find in IMPLEMENTATIONS.items():
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                latest = find(versions_path)
+                timings.append(time.perf_counter() - start)
+                assert latest == expected, latest
+            report["implementations"][name] = {
+                "best_seconds": min(timings),
+                "mean_seconds": sum(timings) / len(timings),
+            }
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic PE images with a VS_VERSIONINFO resource
+
+Produces the smallest PE32/PE32+ file that dlss_pe_version (and Windows'
+own version APIs) will read a file version from, optionally followed by
+filler bytes so it can stand in for a multi-hundred-MB NGX DLL.
+"""
+
+import struct
+
+FILE_ALIGNMENT = 0x200
+RESOURCE_RVA = 0x1000
+FILLER_CHUNK = 8 * 1024 * 1024
+
+
+def _version_info(version):
+    """VS_VERSIONINFO holding only a VS_FIXEDFILEINFO"""
+    major, minor, build, revision = version
+    version_ms = (major << 16) | minor
+    version_ls = (build << 16) | revision
+    fixed = struct.pack('<13I', 0xFEEF04BD, 0x00010000, version_ms, version_ls,
+                        version_ms, version_ls, 0x3F, 0, 0x40004, 2, 0, 0, 0)
+    key = "VS_VERSION_INFO\0".encode('utf-16-le')
+    body = key + b'\0\0' + fixed  # Pad the key to a 32-bit boundary
+    return struct.pack('<HHH', 6 + len(body), len(fixed), 0) + body
+
+
+def _resource_section(version):
+    """.rsrc contents: type 16 -> name 1 -> language 0x409 -> VS_VERSIONINFO"""
+    def directory(entry_id, target):
+        return struct.pack('<IIHHHH', 0, 0, 0, 0, 0, 1) + struct.pack('<II', entry_id, target)
+
+    info = _version_info(version)
+    section = (directory(16, 0x80000000 | 0x18)
+               + directory(1, 0x80000000 | 0x30)
+               + directory(0x409, 0x48)
+               + struct.pack('<IIII', RESOURCE_RVA + 0x58, len(info), 0, 0)
+               + info)
+    return section
+
+
+def build_pe(version=(310, 2, 1, 0), pe32_plus=True):
+    """Return the bytes of a minimal PE image reporting ``version``"""
+    rsrc = _resource_section(version)
+    raw_size = (len(rsrc) + FILE_ALIGNMENT - 1) // FILE_ALIGNMENT * FILE_ALIGNMENT
+
+    directories = [(0, 0)] * 16
+    directories[2] = (RESOURCE_RVA, len(rsrc))
+    directory_bytes = b''.join(struct.pack('<II', *d) for d in directories)
+    if pe32_plus:
+        optional = struct.pack('<H', 0x20B) + b'\0' * 106 + struct.pack('<I', 16)
+    else:
+        optional = struct.pack('<H', 0x10B) + b'\0' * 90 + struct.pack('<I', 16)
+    optional += directory_bytes
+
+    coff = struct.pack('<HHIIIHH', 0x8664 if pe32_plus else 0x14C, 1, 0, 0, 0,
+                       len(optional), 0x2022)
+    section = struct.pack('<8sIIIIIIHHI', b'.rsrc', len(rsrc), RESOURCE_RVA, raw_size,
+                          FILE_ALIGNMENT, 0, 0, 0, 0, 0x40000040)
+
+    dos = b'MZ' + b'\0' * 0x3A + struct.pack('<I', 0x40)
+    headers = dos + b'PE\0\0' + coff + optional + section
+    headers += b'\0' * (FILE_ALIGNMENT - len(headers))
+    return headers + rsrc + b'\0' * (raw_size - len(rsrc))
+
+
+def write_pe(path, version=(310, 2, 1, 0), size=0, pe32_plus=True):
+    """Write a synthetic PE to ``path``, padded with filler up to ``size`` bytes"""
+    image = build_pe(version, pe32_plus)
+    with open(path, 'wb') as f:
+        f.write(image)
+        remaining = size - len(image)
+        filler = b'\xCC' * min(max(remaining, 0), FILLER_CHUNK)
+        while remaining > 0:
+            f.write(filler[:remaining])
+            remaining -= len(filler)
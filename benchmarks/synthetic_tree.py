@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic NGX models trees
+
+Builds ``models/<dlss|dlssg|dlssd>/versions/<n>/files/nvngx_<model>.bin``
+trees in a scratch directory, with a configurable number of version
+folders, file sizes and backup clutter (backup store entries and legacy
+``.bin.bak.<timestamp>`` files), plus newer source DLLs to update from.
+Every .bin and DLL is a synthetic PE with a real version resource, so
+version checks behave as on a live install. Works on any OS, without
+admin rights or a GPU.
+"""
+
+import os
+import sys
+import json
+from dataclasses import asdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dlss_backup_store import MANIFEST_FORMAT_VERSION, BackupEntry, BackupStore
+from dlss_engine import MODEL_MAP
+from dlss_hash_cache import file_digest
+
+from synthetic_pe import write_pe
+
+SOURCE_VERSION = (310, 9, 0, 0)
+
+
+def make_versions_dir(versions_path, count, extra_files=0):
+    """Create ``count`` empty numeric version folders (and some stray files)"""
+    os.makedirs(versions_path, exist_ok=True)
+    for version in range(1, count + 1):
+        os.mkdir(os.path.join(versions_path, str(version)))
+    for index in range(extra_files):
+        open(os.path.join(versions_path, f"stray_{index}.txt"), 'w').close()
+
+
+def build_tree(base, versions=3, size=1024 * 1024, store_backups=0, legacy_backups=0,
+               backup_size=64 * 1024):
+    """Create a models tree and source DLLs under ``base``.
+
+    Each model gets ``versions`` version folders holding one ``size``-byte
+    .bin, and ``store_backups`` backup store entries plus
+    ``legacy_backups`` legacy backup files of ``backup_size`` bytes, dated
+    one day apart. Returns ``(models_root, {dll_name: source_path})``.
+    """
+    models_root = os.path.join(base, "models")
+    source_dir = os.path.join(base, "source")
+    os.makedirs(source_dir)
+    store = BackupStore(models_root)
+    now = datetime.now()
+    entries = []
+
+    for model_index, (dll_name, model_name) in enumerate(MODEL_MAP.items()):
+        versions_path = os.path.join(models_root, model_name, "versions")
+        for version in range(1, versions + 1):
+            files_path = os.path.join(versions_path, str(version), "files")
+            os.makedirs(files_path)
+            write_pe(os.path.join(files_path, f"nvngx_{model_name}.bin"),
+                     (310, 1, version, 0), size)
+
+        latest_files = os.path.join(versions_path, str(versions), "files")
+        target = os.path.join(latest_files, f"nvngx_{model_name}.bin")
+        for index in range(store_backups):
+            # Distinct versions give every blob distinct bytes, so none dedupe
+            staging = os.path.join(base, "blob.tmp")
+            write_pe(staging, (300, model_index, index, 0), backup_size)
+            digest = file_digest(staging)
+            blob_path = store.blob_path(digest)
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(staging, blob_path)
+            created = now - timedelta(days=store_backups - index)
+            entries.append(BackupEntry(model=model_name, version=str(versions),
+                                       target=store.relative_target(target), sha256=digest,
+                                       size=backup_size,
+                                       created=created.isoformat(timespec='seconds')))
+        for index in range(legacy_backups):
+            created = now - timedelta(days=legacy_backups - index, hours=12)
+            write_pe(f"{target}.bak.{created.strftime('%Y%m%d_%H%M%S')}",
+                     (290, model_index, index, 0), backup_size)
+
+        write_pe(os.path.join(source_dir, dll_name), SOURCE_VERSION, size)
+
+    if entries:
+        os.makedirs(store.root, exist_ok=True)
+        with open(store.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": MANIFEST_FORMAT_VERSION,
+                       "entries": [asdict(entry) for entry in entries]}, f, indent=1)
+
+    sources = {dll_name: os.path.join(source_dir, dll_name) for dll_name in MODEL_MAP}
+    return models_root, sources
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NVIDIA DLSS Updater - Backup Store
+Content-addressed, deduplicated storage for original .bin files
+"""
+
+import os
+import re
+import json
+import threading
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+
+from dlss_fileops import commit, fsync_directory, stage_copy
+
+# Constants
+STATE_DIR_NAME = ".dlss_updater"
+MANIFEST_FORMAT_VERSION = 1
+LEGACY_BACKUP_PATTERN = re.compile(r'\.bin\.bak\.(\d{8}_\d{6})$')
+
+
+def reclaimable_bytes(path):
+    """Bytes freed by deleting ``path``: nothing while another hardlink remains"""
+    st = os.stat(path)
+    return st.st_size if st.st_nlink <= 1 else 0
+
+
+def select_expired(backups, keep_last=None, keep_days=None, max_bytes=None, now=None):
+    """Apply a retention policy to ``backups`` and return the ones to delete.
+
+    ``backups`` is a list of ``(created, size, item)`` tuples. A backup
+    survives if it is one of the ``keep_last`` newest or younger than
+    ``keep_days``; survivors are then trimmed, oldest first, until their
+    total size fits in ``max_bytes``. Policies left as None do not apply,
+    and with no keep rule at all every backup is a survivor.
+    """
+    now = now or datetime.now()
+    newest_first = sorted(backups, key=lambda backup: backup[0], reverse=True)
+    has_keep_rule = keep_last is not None or keep_days is not None
+
+    kept, expired = [], []
+    for index, backup in enumerate(newest_first):
+        keep = not has_keep_rule
+        if keep_last is not None and index < keep_last:
+            keep = True
+        if keep_days is not None and now - backup[0] <= timedelta(days=keep_days):
+            keep = True
+        (kept if keep else expired).append(backup)
+
+    if max_bytes is not None:
+        total = 0
+        for backup in list(kept):
+            total += backup[1]
+            if total > max_bytes:
+                kept.remove(backup)
+                expired.append(backup)
+
+    return [backup[2] for backup in expired]
+
+
+class ManifestError(Exception):
+    """The backup manifest exists but cannot be read, so it must not be rewritten"""
+
+
+@dataclass
+class BackupEntry:
+    """One backup event: which file of which model was saved, and when"""
+    model: str
+    version: str
+    target: str  # Path of the backed-up .bin, relative to the models root
+    sha256: str
+    size: int
+    created: str  # ISO 8601 local time
+
+
+class BackupStore:
+    """Backups of .bin files, stored once per distinct SHA-256.
+
+    Blobs live under ``<models root>/.dlss_updater/backups/blobs`` so they
+    are on the same volume as the model files and can be hardlinked rather
+    than copied. ``manifest.json`` records every backup event (model,
+    version, target, time) and points at the blob holding its bytes.
+    A manifest that exists but cannot be read is left untouched: ``error``
+    says why, the store then holds no entries, and writes raise
+    ``ManifestError`` rather than replace the backup history.
+    """
+
+    def __init__(self, models_root):
+        self.models_root = models_root
+        self.root = os.path.join(models_root, STATE_DIR_NAME, "backups")
+        self.blobs_dir = os.path.join(self.root, "blobs")
+        self.manifest_path = os.path.join(self.root, "manifest.json")
+        self._lock = threading.Lock()
+        self._entries = None
+        self.error = None
+
+    def blob_path(self, digest):
+        """Return the path of the blob holding ``digest``"""
+        return os.path.join(self.blobs_dir, digest[:2], digest)
+
+    def relative_target(self, target_path):
+        """Express a target path relative to the models root"""
+        return os.path.relpath(target_path, self.models_root)
+
+    def entries(self):
+        """Return all manifest entries, oldest first"""
+        with self._lock:
+            return list(self._load())
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = []
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") != MANIFEST_FORMAT_VERSION:
+                    raise ValueError(f"unsupported format version {data.get('version')!r}")
+                self._entries = [BackupEntry(**entry) for entry in data.get("entries", [])]
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, TypeError, AttributeError) as e:
+                self._entries = []
+                self.error = (f"Cannot read backup manifest {self.manifest_path} ({e}); "
+                              f"repair or remove it")
+        return self._entries
+
+    def _save(self):
+        if self.error:
+            raise ManifestError(self.error)
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": MANIFEST_FORMAT_VERSION,
+                       "entries": [asdict(entry) for entry in self._entries]}, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.manifest_path)
+        fsync_directory(self.root)
+
+    def add(self, target_path, digest, model_name, version_name, move=False):
+        """Back up ``target_path`` (whose SHA-256 is ``digest``).
+
+        The blob is only written when no backup with these bytes exists
+        yet, and the original is read at most once: it is hardlinked when
+        the filesystem allows it, otherwise renamed into the store if
+        ``move`` is set (the caller is about to replace the target anyway),
+        and only copied as a last resort. Returns the new entry and how the
+        blob was obtained: "existing", "hardlink", "rename" or "copy".
+        """
+        blob_path = self.blob_path(digest)
+        if os.path.exists(blob_path):
+            method = "existing"
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            try:
+                os.link(target_path, blob_path)
+                method = "hardlink"
+            except FileExistsError:
+                method = "existing"  # Another worker stored the same bytes first
+            except OSError:
+                if move:
+                    os.replace(target_path, blob_path)
+                    method = "rename"
+                else:
+                    staged_path, _, _ = stage_copy(target_path, os.path.dirname(blob_path))
+                    commit(staged_path, blob_path)
+                    method = "copy"
+
+        try:
+            entry = BackupEntry(model=model_name,
+                                version=version_name,
+                                target=self.relative_target(target_path),
+                                sha256=digest,
+                                size=os.path.getsize(blob_path),
+                                created=datetime.now().isoformat(timespec='seconds'))
+            with self._lock:
+                entries = self._load()
+                entries.append(entry)
+                try:
+                    self._save()
+                except BaseException:
+                    entries.remove(entry)
+                    raise
+        except BaseException:
+            if method == "rename":
+                # Never leave the original only in the store of a failed backup
+                os.replace(blob_path, target_path)
+            raise
+        return entry, method
+
+    def latest(self, target_path):
+        """Return the most recent entry for a target whose blob still exists"""
+        relative = self.relative_target(target_path)
+        with self._lock:
+            for entry in reversed(self._load()):
+                if entry.target == relative and os.path.exists(self.blob_path(entry.sha256)):
+                    return entry
+        return None
+
+    def targets(self, model_name, version_name):
+        """Return absolute paths of every target backed up for a model version"""
+        with self._lock:
+            relatives = {entry.target for entry in self._load()
+                         if entry.model == model_name and entry.version == version_name}
+        return sorted(os.path.join(self.models_root, relative) for relative in relatives)
+
+    def sweep_orphans(self, dry_run=False):
+        """Delete files under the blobs folder that no manifest entry refers to.
+
+        Such blobs are left behind by a backup whose manifest update never
+        happened. Returns ``(path, reclaimed_bytes)`` for each file that is
+        (or, with ``dry_run``, would be) deleted. Raises ``ManifestError``
+        when the manifest cannot be read, since every blob might be in use.
+        """
+        with self._lock:
+            entries = self._load()
+            if self.error:
+                raise ManifestError(self.error)
+            referenced = {self.blob_path(entry.sha256) for entry in entries}
+            deleted = []
+            try:
+                prefixes = sorted(os.scandir(self.blobs_dir), key=lambda entry: entry.name)
+            except FileNotFoundError:
+                return deleted
+            for prefix in prefixes:
+                if not prefix.is_dir():
+                    continue
+                for blob in sorted(os.scandir(prefix.path), key=lambda entry: entry.name):
+                    if blob.path in referenced or not blob.is_file():
+                        continue
+                    deleted.append((blob.path, reclaimable_bytes(blob.path)))
+                    if not dry_run:
+                        os.remove(blob.path)
+        return deleted
+
+    def prune(self, doomed, dry_run=False):
+        """Drop manifest entries and delete the blobs nothing refers to anymore.
+
+        Returns ``(blob_path, reclaimed_bytes)`` for each blob that is (or,
+        with ``dry_run``, would be) deleted.
+        """
+        with self._lock:
+            doomed_ids = {id(entry) for entry in doomed}
+            remaining = [entry for entry in self._load() if id(entry) not in doomed_ids]
+            still_used = {entry.sha256 for entry in remaining}
+            deleted = []
+            for digest in sorted({entry.sha256 for entry in doomed} - still_used):
+                blob_path = self.blob_path(digest)
+                if not os.path.exists(blob_path):
+                    continue
+                deleted.append((blob_path, reclaimable_bytes(blob_path)))
+                if not dry_run:
+                    os.remove(blob_path)
+            if not dry_run and len(remaining) != len(self._entries):
+                self._entries = remaining
+                self._save()
+        return deleted
@@ -0,0 +1,1011 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NVIDIA DLSS Updater - Core Engine
+Shared resolve/backup/replace pipeline used by both the GUI and CLI frontends
+"""
+
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from dlss_backup_store import (LEGACY_BACKUP_PATTERN, BackupStore, ManifestError,
+                               reclaimable_bytes, select_expired)
+from dlss_fileops import Cancelled, commit, discard, replace_atomic, stage_copy
+from dlss_hash_cache import file_digest
+from dlss_journal import Journal
+from dlss_pe_version import format_version, read_file_version
+from dlss_tree_index import TreeIndex, select_target
+
+# Constants
+DEFAULT_MODELS_ROOT = r"C:\ProgramData\NVIDIA\NGX\models"
+MODEL_MAP = {
+    "nvngx_dlss.dll": "dlss",
+    "nvngx_dlssg.dll": "dlssg",
+    "nvngx_dlssd.dll": "dlssd"
+}
+WAIT_SLICE = 0.1  # Seconds between checks while waiting on worker threads
+
+
+@dataclass
+class EngineEvent:
+    """A single progress notification emitted by the engine"""
+    kind: str
+    status: str = "INFO"
+    data: dict = field(default_factory=dict)
+    timestamp_ns: int = field(default_factory=time.monotonic_ns)
+
+
+@dataclass
+class UpdateResult:
+    """Outcome of updating one DLL"""
+    dll_name: str
+    model_name: str
+    source_path: str
+    success: bool = False
+    version_name: str = ""
+    target_path: str = ""
+    source_version: tuple = None
+    installed_version: tuple = None
+    backup_path: str = ""
+    already_current: bool = False
+    bytes_written: int = 0
+    copy_strategy: str = ""
+    verified: bool = False
+    rolled_back: bool = False
+    error: str = ""
+
+
+@dataclass
+class RestoreResult:
+    """Outcome of restoring one .bin file from its backup"""
+    model_name: str
+    target_path: str
+    backup_path: str
+    success: bool = False
+    error: str = ""
+
+
+@dataclass
+class TargetResolution:
+    """Where a model's live .bin is, or which step failed to find it"""
+    model_name: str
+    versions_path: str
+    version_name: str = ""
+    files_path: str = ""
+    target_path: str = ""
+    selected_by: str = ""  # "only", "largest", "manifest" or "glob"
+    candidates: list = field(default_factory=list)  # Every .bin in files_path, sorted
+    error: str = ""
+
+
+@dataclass
+class PlanEntry:
+    """What an update of one DLL would do, decided from file headers only"""
+    dll_name: str
+    model_name: str
+    source_path: str
+    action: str  # "upgrade", "downgrade", "same", "unknown" or "error"
+    version_name: str = ""
+    target_path: str = ""
+    target_selected_by: str = ""
+    target_candidates: list = field(default_factory=list)
+    source_version: str = "unknown"
+    installed_version: str = "unknown"
+    allowed: bool = True
+    source_size: int = None
+    target_size: int = None
+    source_sha256: str = None  # From the hash cache only; None if not known
+    target_sha256: str = None
+    actions: list = field(default_factory=list)
+    error: str = ""
+
+
+@dataclass
+class RootSummary:
+    """Outcome of updating the DLLs under one models root"""
+    models_root: str
+    results: list = field(default_factory=list)
+    exit_code: int = 1
+    error: str = ""
+
+
+@dataclass
+class RecoveryResult:
+    """What recovery did with one replacement an earlier run left unfinished"""
+    target_path: str
+    action: str  # "rolled_forward", "rolled_back", "settled" or "failed"
+    error: str = ""
+
+
+@dataclass
+class GCResult:
+    """Backups deleted (or, in a dry run, selected) for one model"""
+    model_name: str
+    removed: list = field(default_factory=list)
+    reclaimed_bytes: int = 0
+    errors: list = field(default_factory=list)
+
+
+def exit_code(results):
+    """Map update results to the CLI exit code (0 all ok, 2 partial, 1 none)"""
+    success_count = sum(1 for result in results if result.success)
+    if success_count == len(results):
+        return 0
+    if success_count > 0:
+        return 2
+    return 1
+
+
+def combined_exit_code(codes):
+    """Combine per-root exit codes (0 if all succeeded, 1 if all failed, else 2)"""
+    codes = list(codes)
+    if all(code == 0 for code in codes):
+        return 0
+    if all(code == 1 for code in codes):
+        return 1
+    return 2
+
+
+def wait_all(futures):
+    """Return the futures' results in order, waiting in short slices.
+
+    A thread blocked on a lock cannot run signal handlers on Windows, so a
+    plain ``future.result()`` would hold off a Ctrl-C until every worker
+    finished; waking up every ``WAIT_SLICE`` lets the handler run promptly.
+    """
+    pending = set(futures)
+    while pending:
+        _, pending = wait(pending, timeout=WAIT_SLICE)
+    return [future.result() for future in futures]
+
+
+def update_roots(engines, dll_files, create_backup=True, jobs=1, root_jobs=1):
+    """Install the same DLLs under several models roots, one engine per root.
+
+    Up to ``root_jobs`` roots are processed at a time, each updating up
+    to ``jobs`` models in parallel. An unexpected error fails only its own
+    root. Returns one ``RootSummary`` per engine, in order.
+    """
+    def update_root(engine):
+        try:
+            results = engine.update_many(dll_files, create_backup, jobs)
+            return RootSummary(engine.models_root, results, exit_code(results))
+        except Exception as e:
+            return RootSummary(engine.models_root, error=str(e))
+
+    if root_jobs <= 1 or len(engines) <= 1:
+        return [update_root(engine) for engine in engines]
+    with ThreadPoolExecutor(max_workers=min(root_jobs, len(engines))) as pool:
+        return wait_all([pool.submit(update_root, engine) for engine in engines])
+
+
+def classify_versions(source_version, installed_version):
+    """Compare two version tuples as an update action"""
+    if source_version is None or installed_version is None:
+        return "unknown"
+    if source_version > installed_version:
+        return "upgrade"
+    if source_version < installed_version:
+        return "downgrade"
+    return "same"
+
+
+class DLSSUpdaterEngine:
+    """Resolve, back up and replace NGX model files under a models root.
+
+    The engine has no UI dependencies. Progress is reported through the
+    optional ``listener`` callable, which receives an ``EngineEvent`` for
+    every step; frontends decide how (or whether) to render each kind.
+    """
+
+    def __init__(self, models_root=DEFAULT_MODELS_ROOT, listener=None, hash_cache=None,
+                 verify=True, allow_downgrade=False, target_glob=None, cancel_token=None,
+                 transactional=False):
+        self.models_root = models_root
+        self.listener = listener
+        self.hash_cache = hash_cache  # Optional HashCache consulted before hashing a file
+        self.verify = verify  # Hash copies and check them when the source digest is known
+        self.allow_downgrade = allow_downgrade  # Install DLLs older than the installed one
+        self.target_glob = target_glob  # Picks the .bin among several; see select_target
+        self.cancel_token = cancel_token  # Optional CancelToken; see update_many
+        self.transactional = transactional  # update_many replaces every model or none
+        self.backup_store = BackupStore(models_root)
+        self.tree = TreeIndex(models_root)  # Shared cache of version folders
+        self.journal = Journal(models_root)  # Replayed by recover before the first change
+        self._emit_lock = threading.Lock()
+        self._recovery_lock = threading.RLock()
+        self._recovered = False
+
+    def emit(self, kind, status="INFO", **data):
+        """Send an event to the listener, if any"""
+        if self.listener is None:
+            return
+        with self._emit_lock:
+            self.listener(EngineEvent(kind, status, data))
+
+    @contextmanager
+    def step(self, name, **data):
+        """Time a pipeline step and emit a "step" event when it ends.
+
+        The body fills in the yielded dict: ``bytes`` moved, ``ok`` (False
+        for a step that failed without raising) and any extra fields.
+        Without a listener nothing is timed or emitted.
+        """
+        record = {"bytes": 0, "ok": True}
+        if self.listener is None:
+            yield record
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield record
+        except BaseException:
+            record["ok"] = False
+            raise
+        finally:
+            duration_ns = time.perf_counter_ns() - start
+            self.emit("step", "", step=name, duration_ns=duration_ns, **data, **record)
+
+    def copy_progress(self, **data):
+        """Return a stage_copy progress callback emitting "copy_progress" events.
+
+        Returns None without a listener, so unobserved copies skip the
+        progress bookkeeping entirely.
+        """
+        if self.listener is None:
+            return None
+
+        def progress(done, total, rate, eta):
+            self.emit("copy_progress", "", done=done, total=total,
+                      percent=100.0 * done / total if total else 100.0,
+                      mb_per_s=rate / (1024 * 1024), eta=eta, **data)
+        return progress
+
+    def check_cancelled(self):
+        """Raise Cancelled if the cancel token has been triggered"""
+        if self.cancel_token is not None:
+            self.cancel_token.check()
+
+    def digest(self, path):
+        """Return the SHA-256 of a file, through the hash cache when present"""
+        if self.hash_cache is not None:
+            return self.hash_cache.digest(path, self.cancel_token)
+        return file_digest(path, self.cancel_token)
+
+    def cached_digest(self, path):
+        """Return the digest of a file only if it is known without reading it"""
+        if self.hash_cache is not None:
+            return self.hash_cache.lookup(path)
+        return None
+
+    def files_identical(self, path_a, path_b):
+        """Check whether two files hold the same bytes (size first, then hash)"""
+        if os.path.getsize(path_a) != os.path.getsize(path_b):
+            return False
+        return self.digest(path_a) == self.digest(path_b)
+
+    def versions_path(self, model_name):
+        """Return the versions directory of a model"""
+        return self.tree.versions_path(model_name)
+
+    def scan_model(self, model_name):
+        """Return the tree index entry of a model (rescanned only if it changed)"""
+        with self.step("scan", model_name=model_name):
+            return self.tree.model(model_name)
+
+    def resolve_target(self, model_name):
+        """Find the .bin file of a model's latest version"""
+        index = self.scan_model(model_name)
+        resolution = TargetResolution(model_name, index.versions_path)
+
+        if index.versions_mtime_ns is None:
+            resolution.error = "versions_missing"
+            return resolution
+
+        if not index.version_name:
+            resolution.error = "no_version"
+            return resolution
+
+        resolution.version_name = index.version_name
+        resolution.files_path = index.files_path
+
+        if index.files_mtime_ns is None:
+            resolution.error = "files_missing"
+            return resolution
+
+        if not index.bin_sizes:
+            resolution.error = "no_bin"
+            return resolution
+
+        # Choose deterministically when there are several candidates
+        resolution.candidates = sorted(index.bin_sizes)
+        target_name, resolution.selected_by = select_target(
+            index.bin_sizes, index.manifest_names, self.target_glob)
+        if target_name is None:
+            resolution.error = "no_bin_match"
+            return resolution
+
+        resolution.target_path = os.path.join(index.files_path, target_name)
+        return resolution
+
+    def plan_updates(self, dll_files, create_backup=True):
+        """Decide what updating each DLL would do, without changing anything.
+
+        Only directory listings, file sizes, PE headers and the hash cache
+        are consulted, so planning takes milliseconds regardless of file
+        sizes and writes nothing. ``actions`` lists the steps an update
+        would take: "refuse_downgrade", "none" (already current), or
+        "stage", "backup"/"backup_existing" and "replace".
+        """
+        plan = []
+        for dll_name, source_path in dll_files.items():
+            model_name = MODEL_MAP[dll_name]
+            entry = PlanEntry(dll_name, model_name, source_path, "error", allowed=False)
+            plan.append(entry)
+
+            if not os.path.exists(source_path):
+                entry.error = "source_missing"
+                continue
+
+            resolution = self.resolve_target(model_name)
+            entry.version_name = resolution.version_name
+            entry.target_candidates = resolution.candidates
+            if resolution.error:
+                entry.error = resolution.error
+                continue
+            entry.target_path = resolution.target_path
+            entry.target_selected_by = resolution.selected_by
+
+            source_version = read_file_version(source_path)
+            installed_version = read_file_version(resolution.target_path)
+            entry.source_version = format_version(source_version)
+            entry.installed_version = format_version(installed_version)
+            entry.action = classify_versions(source_version, installed_version)
+            entry.allowed = entry.action != "downgrade" or self.allow_downgrade
+
+            entry.source_size = os.path.getsize(source_path)
+            entry.target_size = os.path.getsize(entry.target_path)
+            entry.source_sha256 = self.cached_digest(source_path)
+            entry.target_sha256 = self.cached_digest(entry.target_path)
+
+            if not entry.allowed:
+                entry.actions = ["refuse_downgrade"]
+            elif (entry.source_size == entry.target_size and entry.source_sha256 is not None
+                    and entry.source_sha256 == entry.target_sha256):
+                entry.actions = ["none"]
+            else:
+                entry.actions = ["stage"]
+                if create_backup:
+                    backed_up = (entry.target_sha256 is not None and os.path.exists(
+                        self.backup_store.blob_path(entry.target_sha256)))
+                    entry.actions.append("backup_existing" if backed_up else "backup")
+                entry.actions.append("replace")
+
+        return plan
+
+    def recover(self):
+        """Complete or undo the replacements an interrupted run left open.
+
+        Each open journal entry is settled by checking which of its files
+        still exist, without hashing anything, so recovery takes time
+        proportional to the journal rather than to the tree:
+          - staged file present and ready: rename it over the target
+            (roll forward);
+          - staged file present, not ready: discard it, restoring the
+            original from its backup if it had been moved there (roll back);
+          - staged file gone, target present: the rename or the discard
+            had already happened, so nothing is left to do;
+          - both gone: restore the original from its backup.
+        The journal is emptied afterwards, except for the entries that
+        failed, which are retried on the next start. Returns one
+        ``RecoveryResult`` per open entry.
+        """
+        with self._recovery_lock:
+            self._recovered = True
+            results = []
+            failed = []
+            for entry in self.journal.pending():
+                try:
+                    result = RecoveryResult(entry.target_path, self._recover_entry(entry))
+                except Exception as e:
+                    result = RecoveryResult(entry.target_path, "failed", str(e))
+                    failed.append(entry)
+                results.append(result)
+                status = {"failed": "ERROR", "settled": "INFO"}.get(result.action, "SUCCESS")
+                self.emit(f"recovery_{result.action}", status, target_path=result.target_path,
+                          error=result.error)
+            if results:
+                self.journal.clear(keep=failed)
+            return results
+
+    def ensure_recovered(self):
+        """Run recover once, before this engine first changes any file"""
+        with self._recovery_lock:
+            if not self._recovered:
+                self.recover()
+
+    def _recover_entry(self, entry):
+        if os.path.exists(entry.staged_path):
+            if entry.ready:
+                commit(entry.staged_path, entry.target_path)
+                if entry.sha256 is not None and self.hash_cache is not None:
+                    self.hash_cache.record(entry.target_path, entry.sha256)
+                return "rolled_forward"
+            discard(entry.staged_path)
+            if os.path.exists(entry.target_path):
+                return "rolled_back"
+        elif os.path.exists(entry.target_path):
+            return "settled"
+        # The original was moved into the backup store and never replaced
+        blob_path = entry.backup_sha256 and self.backup_store.blob_path(entry.backup_sha256)
+        if not blob_path or not os.path.exists(blob_path):
+            raise FileNotFoundError(f"no backup of {entry.target_path} to restore")
+        replace_atomic(blob_path, entry.target_path)
+        return "rolled_back"
+
+    def update_single_dll(self, dll_name, source_path, create_backup=True):
+        """Update a single DLL file"""
+        result, staged_path, source_digest = self.stage_update(dll_name, source_path)
+        if staged_path is None:
+            return result
+
+        # Last point to stop before the live file is touched
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            self.discard_staged(result, staged_path)
+            raise Cancelled()
+
+        # Create backup if requested
+        method = None
+        if create_backup:
+            method = self.back_up(result, staged_path, move=True)
+            if method is None:
+                return result
+
+        self.journal.ready([result.target_path])
+        self.commit_update(result, staged_path, source_digest, moved_to_backup=method == "rename")
+        return result
+
+    def stage_update(self, dll_name, source_path):
+        """Resolve, check, stage and verify one update without touching the target.
+
+        Returns ``(result, staged_path, source_digest)``. ``staged_path`` is
+        None when there is nothing to commit: the result then holds either
+        an error or ``already_current``. Otherwise the caller must pass the
+        staged file to ``commit_update`` or ``discard`` it.
+        """
+        self.ensure_recovered()
+        model_name = MODEL_MAP[dll_name]
+        result = UpdateResult(dll_name, model_name, source_path)
+
+        # Tag every event with the DLL so interleaved parallel output stays readable
+        def emit(kind, status="INFO", **data):
+            self.emit(kind, status, dll_name=dll_name, **data)
+
+        self.check_cancelled()
+        emit("processing")
+
+        # Check if source file exists
+        if not os.path.exists(source_path):
+            result.error = "source_missing"
+            emit("source_missing", "ERROR", source_path=source_path)
+            return result, None, None
+
+        emit("source", "", source_path=source_path)
+        tags = {"dll_name": dll_name, "model_name": model_name}
+
+        resolution = self.resolve_target(model_name)
+        result.version_name = resolution.version_name
+        if resolution.version_name:
+            emit("latest_version", "", version_name=resolution.version_name)
+        if resolution.error:
+            result.error = resolution.error
+            emit(resolution.error, "ERROR", versions_path=resolution.versions_path,
+                 target_glob=self.target_glob, candidates=", ".join(resolution.candidates))
+            return result, None, None
+
+        files_path = resolution.files_path
+        bin_file_path = resolution.target_path
+        result.target_path = bin_file_path
+
+        emit("target", "", target_path=bin_file_path, selected_by=resolution.selected_by,
+             candidates=len(resolution.candidates))
+
+        with self.step("inspect", **tags):
+            result.source_version = read_file_version(source_path)
+            result.installed_version = read_file_version(bin_file_path)
+        emit("dll_versions", "", source_version=format_version(result.source_version),
+             installed_version=format_version(result.installed_version))
+
+        if (classify_versions(result.source_version, result.installed_version) == "downgrade"
+                and not self.allow_downgrade):
+            result.error = "downgrade_refused"
+            emit("downgrade_refused", "ERROR", source_version=format_version(result.source_version),
+                 installed_version=format_version(result.installed_version))
+            return result, None, None
+
+        # Nothing to do when the target already holds these exact bytes
+        with self.step("compare", **tags) as step:
+            try:
+                step["identical"] = self.files_identical(source_path, bin_file_path)
+            except OSError:
+                step["identical"] = False  # Fall through to a regular update
+        if step["identical"]:
+            result.success = True
+            result.already_current = True
+            emit("already_current", "SUCCESS", target_path=bin_file_path)
+            return result, None, None
+
+        # Stage the new file next to the target first; the live .bin is then
+        # only ever touched by a single rename. The staged path is journaled
+        # before the copy starts, so recovery can remove a half-written one
+        source_digest = self.cached_digest(source_path)
+        with self.step("copy", **tags) as step:
+            try:
+                staged_path, result.copy_strategy, staged_digest = stage_copy(
+                    source_path, files_path, with_digest=self.verify,
+                    progress=self.copy_progress(dll_name=dll_name, model_name=model_name),
+                    cancel=self.cancel_token,
+                    on_created=lambda path: self.journal.begin(bin_file_path, path,
+                                                               source_digest))
+                step["bytes"] = os.path.getsize(staged_path)
+                step["strategy"] = result.copy_strategy
+                result.bytes_written += step["bytes"]
+            except Cancelled:
+                self.journal.abort(bin_file_path)
+                raise
+            except Exception as e:
+                step["ok"] = False
+                self.journal.abort(bin_file_path)
+                result.error = str(e)
+                emit("replace_failed", "ERROR", error=str(e))
+                return result, None, None
+
+        # Verify the staged bytes against what the source is known to hold;
+        # either way the streamed digest is remembered for the source, and
+        # for the target once committed, so a rerun compares from the cache
+        if staged_digest is not None:
+            with self.step("verify", **tags) as step:
+                step["ok"] = source_digest is None or staged_digest == source_digest
+            if not step["ok"]:
+                self.discard_staged(result, staged_path)
+                result.error = "verify_failed"
+                emit("verify_failed", "ERROR", expected=source_digest, actual=staged_digest)
+                return result, None, None
+            result.verified = source_digest is not None
+            if source_digest is None and self.hash_cache is not None:
+                self.hash_cache.record(source_path, staged_digest)
+            source_digest = staged_digest
+
+        return result, staged_path, source_digest
+
+    def back_up(self, result, staged_path, move=False):
+        """Add the target of a staged update to the backup store.
+
+        With ``move`` the original may be renamed into the store when it
+        cannot be hardlinked; otherwise it is copied and the target stays in
+        place. Returns the backup method, or None after a failure, in which
+        case the staged file has been discarded; so it is when hashing the
+        original is cancelled, before ``Cancelled`` is raised.
+        """
+        with self.step("backup", dll_name=result.dll_name, model_name=result.model_name) as step:
+            try:
+                digest = self.digest(result.target_path)
+                # Name the blob first, so recovery can find the original if it moves
+                self.journal.backup(result.target_path, digest)
+                entry, method = self.backup_store.add(result.target_path, digest,
+                                                      result.model_name, result.version_name,
+                                                      move=move)
+                backup_path = self.backup_store.blob_path(entry.sha256)
+                step["method"] = method
+                if method == "copy":
+                    step["bytes"] = entry.size
+                    result.bytes_written += entry.size
+
+                result.backup_path = backup_path
+                self.emit("backup_created", "SUCCESS", dll_name=result.dll_name,
+                          backup_path=backup_path, backup_name=entry.sha256[:12], method=method)
+                return method
+            except Cancelled:
+                # Only hashing the original checks the token, so it is untouched
+                self.discard_staged(result, staged_path)
+                raise
+            except Exception as e:
+                step["ok"] = False
+                discard(staged_path)
+                # Leave the entry open if the original did not make it back;
+                # recovery then restores it from the blob
+                if os.path.exists(result.target_path):
+                    self.journal.abort(result.target_path)
+                result.error = str(e)
+                self.emit("backup_failed", "ERROR", dll_name=result.dll_name, error=str(e))
+                return None
+
+    def commit_update(self, result, staged_path, source_digest, moved_to_backup=False):
+        """Rename a staged update over its target, setting ``result.success``"""
+        with self.step("commit", dll_name=result.dll_name, model_name=result.model_name) as step:
+            try:
+                commit(staged_path, result.target_path)
+                # The target now holds the source bytes; remember that if it is free to
+                if source_digest is not None and self.hash_cache is not None:
+                    self.hash_cache.record(result.target_path, source_digest)
+                result.success = True
+                self.emit("replaced", "SUCCESS", dll_name=result.dll_name,
+                          target_path=result.target_path, strategy=result.copy_strategy)
+            except Exception as e:
+                step["ok"] = False
+                discard(staged_path)
+                result.error = str(e)
+                self.emit("replace_failed", "ERROR", dll_name=result.dll_name, error=str(e))
+                if moved_to_backup:
+                    # The original was renamed into the store; put a copy back
+                    replace_atomic(result.backup_path, result.target_path)
+                self.journal.abort(result.target_path)
+                return
+        self.journal.done(result.target_path)
+
+    def discard_staged(self, result, staged_path):
+        """Remove a staged update that will not be committed, keeping the original"""
+        discard(staged_path)
+        self.journal.abort(result.target_path)
+
+    def update_many(self, dll_files, create_backup=True, jobs=1):
+        """Update several DLLs, optionally in parallel.
+
+        ``dll_files`` maps DLL names to source paths. With ``jobs`` greater
+        than one the models are processed on a thread pool; the copies are
+        I/O bound so the GIL is not a bottleneck. Results are returned in
+        the order of ``dll_files``.
+
+        If the cancel token fires, copies in flight stop at their next
+        chunk, models not yet replaced are skipped, and every model this
+        run already replaced is rolled back from its backup.
+        """
+        if self.transactional:
+            return self.update_transactional(dll_files, create_backup, jobs)
+
+        items = list(dll_files.items())
+        if jobs <= 1 or len(items) <= 1:
+            results = [self._update_guarded(dll_name, path, create_backup)
+                       for dll_name, path in items]
+        else:
+            with ThreadPoolExecutor(max_workers=min(jobs, len(items))) as pool:
+                futures = [pool.submit(self._update_guarded, dll_name, path, create_backup)
+                           for dll_name, path in items]
+                results = wait_all(futures)
+
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            self.roll_back(results)
+        return results
+
+    def update_transactional(self, dll_files, create_backup=True, jobs=1):
+        """Update several DLLs so that either all of them change or none do.
+
+        Every model is first staged next to its target and verified (in
+        parallel with ``jobs``), then backed up by hardlink or copy, all
+        with the originals left in place. Only when every model got that
+        far does the commit phase run, which does nothing but one rename
+        per model, so its duration does not depend on file sizes. A
+        failure or cancel before then discards every staged file and
+        leaves all targets untouched; should a rename itself fail, the
+        models already renamed are rolled back from their backups.
+        """
+        items = list(dll_files.items())
+        if jobs <= 1 or len(items) <= 1:
+            staged = [self._stage_guarded(dll_name, path) for dll_name, path in items]
+        else:
+            with ThreadPoolExecutor(max_workers=min(jobs, len(items))) as pool:
+                futures = [pool.submit(self._stage_guarded, dll_name, path)
+                           for dll_name, path in items]
+                staged = wait_all(futures)
+        results = [result for result, _, _ in staged]
+        pending = [(result, staged_path, digest) for result, staged_path, digest in staged
+                   if staged_path is not None]
+
+        failed = [result.dll_name for result, staged_path, _ in staged
+                  if staged_path is None and not result.success]
+        if not failed and create_backup:
+            for result, staged_path, _ in pending:
+                try:
+                    if self.back_up(result, staged_path) is None:
+                        failed.append(result.dll_name)
+                        break
+                except Cancelled:
+                    break  # Reported with the cancel check below
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            failed.append("cancelled")
+        if not failed:
+            try:
+                self.journal.ready([result.target_path for result, _, _ in pending])
+            except OSError as e:
+                failed.append(str(e))
+        if failed:
+            for result, staged_path, _ in pending:
+                self.discard_staged(result, staged_path)
+                if not result.error:
+                    result.error = "transaction_aborted"
+            self.emit("transaction_aborted", "ERROR", failed=", ".join(failed))
+            return results
+
+        # Commit phase: renames only
+        for index, (result, staged_path, digest) in enumerate(pending):
+            self.commit_update(result, staged_path, digest)
+            if not result.success:
+                for leftover_result, leftover, _ in pending[index + 1:]:
+                    self.discard_staged(leftover_result, leftover)
+                self.roll_back([result for result, _, _ in pending[:index]],
+                               "transaction_aborted")
+                for result, _, _ in pending[index + 1:]:
+                    result.error = "transaction_aborted"
+                return results
+        if pending:
+            self.emit("transaction_committed", "SUCCESS", count=len(pending))
+        return results
+
+    def roll_back(self, results, reason="cancelled"):
+        """Put back the original .bin of every model these results replaced"""
+        for result in results:
+            if not result.success or result.already_current:
+                continue
+            result.success = False
+            result.error = reason
+            if not result.backup_path:
+                self.emit("rollback_unavailable", "WARNING", dll_name=result.dll_name,
+                          target_path=result.target_path)
+                continue
+            try:
+                replace_atomic(result.backup_path, result.target_path)
+                result.rolled_back = True
+                self.emit("rolled_back", "SUCCESS", dll_name=result.dll_name,
+                          target_path=result.target_path)
+            except Exception as e:
+                self.emit("rollback_failed", "ERROR", dll_name=result.dll_name,
+                          target_path=result.target_path, error=str(e))
+
+    def _update_guarded(self, dll_name, source_path, create_backup):
+        """Run update_single_dll, turning unexpected errors into a failed result"""
+        try:
+            return self.update_single_dll(dll_name, source_path, create_backup)
+        except Cancelled:
+            self.emit("cancelled", "WARNING", dll_name=dll_name)
+            return UpdateResult(dll_name, MODEL_MAP[dll_name], source_path, error="cancelled")
+        except Exception as e:
+            self.emit("update_error", "ERROR", dll_name=dll_name, error=str(e))
+            return UpdateResult(dll_name, MODEL_MAP[dll_name], source_path, error=str(e))
+
+    def _stage_guarded(self, dll_name, source_path):
+        """Run stage_update, turning a cancel or unexpected error into a failed result"""
+        try:
+            return self.stage_update(dll_name, source_path)
+        except Cancelled:
+            self.emit("cancelled", "WARNING", dll_name=dll_name)
+            error = "cancelled"
+        except Exception as e:
+            self.emit("update_error", "ERROR", dll_name=dll_name, error=str(e))
+            error = str(e)
+        return UpdateResult(dll_name, MODEL_MAP[dll_name], source_path, error=error), None, None
+
+    def auto_detect_dlls(self, directory=None):
+        """Auto-detect DLL files in specified or current directory"""
+        if directory is None:
+            directory = os.path.dirname(os.path.abspath(sys.argv[0]))
+
+        found_dlls = {}
+
+        self.emit("scan_directory", directory=directory)
+
+        for dll_name in MODEL_MAP.keys():
+            dll_path = os.path.join(directory, dll_name)
+            if os.path.exists(dll_path):
+                found_dlls[dll_name] = dll_path
+                self.emit("dll_found", "SUCCESS", dll_name=dll_name, dll_path=dll_path,
+                          sha256=self.cached_digest(dll_path),
+                          version=format_version(read_file_version(dll_path)))
+            else:
+                self.emit("dll_not_found", "WARNING", dll_name=dll_name)
+
+        return found_dlls
+
+    def restore_backups(self, dry_run=False):
+        """Restore .bin files of each model's latest version from backup.
+
+        The most recent backup store entry of each target is used; targets
+        without one fall back to a legacy ``.bin.bak`` file next to them.
+        With ``dry_run`` the backups are found but nothing is written.
+        Once the cancel token fires, the file being copied and all later
+        ones are left as they were and reported as cancelled.
+        """
+        if not dry_run:
+            self.ensure_recovered()
+        self.emit("restore_start", dry_run=dry_run)
+        self.backup_store.entries()
+        if self.backup_store.error:
+            self.emit("manifest_unreadable", "WARNING", error=self.backup_store.error)
+
+        results = []
+
+        for model_name in MODEL_MAP.values():
+            index = self.scan_model(model_name)
+            if index.files_mtime_ns is None:
+                continue  # No versions folder, version or files folder
+
+            version_name = index.version_name
+            backups = {}
+            digests = {}  # Expected SHA-256 of each restore, where known
+            for target_path in self.backup_store.targets(model_name, version_name):
+                entry = self.backup_store.latest(target_path)
+                if entry is not None:
+                    backups[target_path] = self.backup_store.blob_path(entry.sha256)
+                    digests[target_path] = entry.sha256
+
+            # Legacy backups written by earlier versions of this tool
+            for file_name in index.legacy_backups:
+                backup_path = os.path.join(index.files_path, file_name)
+                if backups.setdefault(backup_path[:-4], backup_path) == backup_path:  # Remove .bak
+                    digests[backup_path[:-4]] = self.cached_digest(backup_path)
+
+            for original_path, backup_path in sorted(backups.items()):
+                result = RestoreResult(model_name, original_path, backup_path)
+                if self.cancel_token is not None and self.cancel_token.cancelled:
+                    result.error = "cancelled"
+                    results.append(result)
+                    continue
+
+                if dry_run:
+                    results.append(result)
+                    self.emit("restore_planned", "", target_path=original_path,
+                              target_name=os.path.basename(original_path), backup_path=backup_path)
+                    continue
+
+                tags = {"model_name": model_name, "target_path": original_path}
+                # A blob is named by its SHA-256, so the copy is checked while
+                # it is made instead of re-reading both files afterwards
+                expected = digests.get(original_path)
+                try:
+                    with self.step("restore", **tags) as step:
+                        staged_path, strategy, digest = stage_copy(
+                            backup_path, os.path.dirname(original_path),
+                            with_digest=expected is not None,
+                            progress=self.copy_progress(
+                                model_name=model_name,
+                                target_name=os.path.basename(original_path)),
+                            cancel=self.cancel_token)
+                        step["strategy"] = strategy
+                        step["bytes"] = os.path.getsize(staged_path)
+                    if expected is not None:
+                        with self.step("verify", **tags) as step:
+                            step["ok"] = digest == expected
+                        if not step["ok"]:
+                            discard(staged_path)
+                            raise OSError("restored file does not match its backup")
+                    try:
+                        commit(staged_path, original_path)
+                    except BaseException:
+                        discard(staged_path)
+                        raise
+                    if expected is not None and self.hash_cache is not None:
+                        self.hash_cache.record(original_path, expected)
+                    result.success = True
+                    self.emit("restored", "SUCCESS", target_path=original_path,
+                              target_name=os.path.basename(original_path),
+                              strategy=strategy)
+                except Cancelled:
+                    result.error = "cancelled"
+                    self.emit("cancelled", "WARNING", target_path=original_path,
+                              target_name=os.path.basename(original_path))
+                except Exception as e:
+                    result.error = str(e)
+                    self.emit("restore_failed", "ERROR", target_path=original_path,
+                              target_name=os.path.basename(original_path), error=str(e))
+                results.append(result)
+
+        return results
+
+    def _legacy_backups(self, model_name):
+        """Yield (path, created) for .bin.bak.<timestamp> files of every version"""
+        versions_path = self.versions_path(model_name)
+        if not os.path.isdir(versions_path):
+            return
+        for version in os.listdir(versions_path):
+            files_path = os.path.join(versions_path, version, "files")
+            if not os.path.isdir(files_path):
+                continue
+            for file_name in os.listdir(files_path):
+                match = LEGACY_BACKUP_PATTERN.search(file_name)
+                if not match:
+                    continue
+                try:
+                    created = datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+                except ValueError:
+                    continue  # Looks like a timestamp but is not a real date
+                yield os.path.join(files_path, file_name), created
+
+    def collect_garbage(self, keep_last=None, keep_days=None, max_bytes=None, dry_run=False):
+        """Delete old backups according to a retention policy, one pass per model.
+
+        Backup store blobs and legacy ``.bin.bak.<timestamp>`` files are
+        judged together: a blob counts once however many backups used it,
+        dated by its most recent use. ``max_bytes`` is a per-model budget.
+        Blobs no manifest entry refers to are then deleted too, reported
+        under the model name "orphans". With ``dry_run`` nothing is deleted
+        and the results describe what would be.
+        """
+        if not dry_run:
+            self.ensure_recovered()  # Settle first: recovery may need a backup GC would delete
+        self.emit("gc_start", dry_run=dry_run)
+
+        entries = self.backup_store.entries()
+        if self.backup_store.error:
+            self.emit("manifest_unreadable", "WARNING", error=self.backup_store.error)
+        results = []
+
+        for model_name in MODEL_MAP.values():
+            result = GCResult(model_name)
+            backups = []
+
+            by_digest = {}
+            for entry in entries:
+                if entry.model == model_name:
+                    by_digest.setdefault(entry.sha256, []).append(entry)
+            for group in by_digest.values():
+                created = max(datetime.fromisoformat(entry.created) for entry in group)
+                backups.append((created, group[0].size, ("store", group)))
+
+            for path, created in self._legacy_backups(model_name):
+                backups.append((created, os.path.getsize(path), ("legacy", path)))
+
+            expired = select_expired(backups, keep_last, keep_days, max_bytes)
+
+            removals = []
+            doomed = [entry for kind, item in expired if kind == "store" for entry in item]
+            try:
+                removals.extend(self.backup_store.prune(doomed, dry_run))
+            except OSError as e:
+                result.errors.append(str(e))
+                self.emit("gc_failed", "ERROR", model_name=model_name, error=str(e))
+
+            for kind, path in expired:
+                if kind != "legacy":
+                    continue
+                try:
+                    reclaimed = reclaimable_bytes(path)
+                    if not dry_run:
+                        os.remove(path)
+                    removals.append((path, reclaimed))
+                except OSError as e:
+                    result.errors.append(str(e))
+                    self.emit("gc_failed", "ERROR", model_name=model_name, error=str(e))
+
+            for path, reclaimed in removals:
+                result.removed.append(path)
+                result.reclaimed_bytes += reclaimed
+                self.emit("gc_removed", "", model_name=model_name, path=path,
+                          size=reclaimed, dry_run=dry_run)
+
+            self.emit("gc_model", "SUCCESS" if not result.errors else "WARNING",
+                      model_name=model_name, count=len(result.removed),
+                      reclaimed_mb=result.reclaimed_bytes / (1024 * 1024), dry_run=dry_run)
+            results.append(result)
+
+        # Blobs whose backup never made it into the manifest
+        result = GCResult("orphans")
+        try:
+            for path, reclaimed in self.backup_store.sweep_orphans(dry_run):
+                result.removed.append(path)
+                result.reclaimed_bytes += reclaimed
+                self.emit("gc_removed", "", model_name=result.model_name, path=path,
+                          size=reclaimed, dry_run=dry_run)
+        except (OSError, ManifestError) as e:
+            result.errors.append(str(e))
+            self.emit("gc_failed", "ERROR", model_name=result.model_name, error=str(e))
+        if result.removed:
+            self.emit("gc_model", "SUCCESS" if not result.errors else "WARNING",
+                      model_name=result.model_name, count=len(result.removed),
+                      reclaimed_mb=result.reclaimed_bytes / (1024 * 1024), dry_run=dry_run)
+        results.append(result)
+
+        return results
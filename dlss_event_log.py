@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NVIDIA DLSS Updater - Event Log
+Writes engine events as JSON lines for metrics pipelines
+"""
+
+import sys
+import json
+
+
+def event_record(event):
+    """Flatten an EngineEvent into a JSON-serializable dict"""
+    record = {"ts_ns": event.timestamp_ns, "kind": event.kind, "status": event.status}
+    record.update(event.data)
+    return record
+
+
+class JsonLinesLog:
+    """Engine listener that writes one JSON object per event.
+
+    Every event is written, including the "step" events that carry a
+    duration and byte count but have no console text. Timestamps are
+    ``time.monotonic_ns()`` values: only differences between them are
+    meaningful. Lines are flushed as they are written so a log being
+    tailed (or a run that crashes) loses nothing.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        if path is None:
+            self.stream = sys.stdout
+        else:
+            self.stream = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, event):
+        self.stream.write(json.dumps(event_record(event), default=str) + "\n")
+        self.stream.flush()
+
+    def close(self):
+        """Close the log file (stdout is left open)"""
+        if self.path is not None:
+            self.stream.close()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NVIDIA DLSS Updater - File Operations
+Fast kernel-assisted copies, and crash-safe replacement via staged temp files
+"""
+
+import os
+import sys
+import errno
+import shutil
+import time
+import hashlib
+import tempfile
+import threading
+
+# Constants
+STAGING_PREFIX = ".dlss_"
+STAGING_SUFFIX = ".tmp"
+COPY_BUFFER_SIZE = 8 * 1024 * 1024
+KERNEL_COPY_CHUNK = 1024 * 1024 * 1024
+# Kernel copy chunk while progress or cancellation is observed: small
+# enough that a cancel lands within ~100 ms on fast disks
+CALLBACK_CHUNK = 16 * 1024 * 1024
+PROGRESS_INTERVAL = 0.25  # Seconds between progress callbacks
+FICLONE = 0x40049409  # Linux _IOW(0x94, 9, int): share extents on btrfs/XFS
+
+# Errors meaning "this strategy cannot copy between these files", as
+# opposed to a genuine I/O failure
+UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTSUP,
+                      errno.EINVAL, errno.EBADF, errno.ETXTBSY, errno.ENOTTY, errno.EPERM}
+
+
+class CopyUnsupported(Exception):
+    """A copy strategy is not available for this pair of files"""
+
+
+def _unsupported(error):
+    return isinstance(error, OSError) and error.errno in UNSUPPORTED_ERRNOS
+
+
+class Cancelled(Exception):
+    """The operation was cancelled through its CancelToken"""
+
+
+class CancelToken:
+    """Thread-safe flag a UI sets to stop a running operation.
+
+    Copy loops check it between chunks and long operations between steps;
+    ``check`` raises ``Cancelled`` once ``cancel`` has been called.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """Request cancellation"""
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """Raise Cancelled if cancellation was requested"""
+        if self._event.is_set():
+            raise Cancelled()
+
+
+class CopyProgress:
+    """Throttled progress reporting for one copy.
+
+    Called with the number of bytes copied so far after every chunk, it
+    invokes ``callback(done, total, bytes_per_second, eta_seconds)`` at
+    most once per ``interval`` seconds, and always for the final chunk.
+    The rate is measured over the last interval; the ETA is None until a
+    rate is known.
+    """
+
+    def __init__(self, callback, total, interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.total = total
+        self.interval = interval
+        self._last_time = time.monotonic()
+        self._last_done = 0
+
+    def __call__(self, done):
+        now = time.monotonic()
+        elapsed = now - self._last_time
+        if done < self.total and elapsed < self.interval:
+            return
+        rate = (done - self._last_done) / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - done) / rate if rate > 0 else None
+        self._last_time = now
+        self._last_done = done
+        self.callback(done, self.total, rate, eta)
+
+
+def _chunk_hook(progress, cancel, total):
+    """Combine progress reporting and cancellation into one per-chunk callback"""
+    reporter = None if progress is None else CopyProgress(progress, total)
+    if cancel is None:
+        return reporter
+
+    def on_chunk(done):
+        cancel.check()
+        if reporter is not None:
+            reporter(done)
+    return on_chunk
+
+
+def _copy_reflink(src, dst, size, on_chunk=None):
+    """Clone the source extents into the destination (no data is copied)"""
+    if not sys.platform.startswith('linux'):
+        raise CopyUnsupported("reflink")
+    import fcntl
+    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    if on_chunk is not None:
+        on_chunk(size)
+
+
+def _copy_file_range(src, dst, size, on_chunk=None):
+    """In-kernel copy; filesystems may also share extents or offload it"""
+    if not hasattr(os, 'copy_file_range'):
+        raise CopyUnsupported("copy_file_range")
+    chunk = KERNEL_COPY_CHUNK if on_chunk is None else CALLBACK_CHUNK
+    offset = 0
+    while offset < size:
+        copied = os.copy_file_range(src.fileno(), dst.fileno(),
+                                    min(size - offset, chunk), offset, offset)
+        if copied == 0:
+            raise OSError(errno.EIO, "copy_file_range stopped early")
+        offset += copied
+        if on_chunk is not None:
+            on_chunk(offset)
+
+
+def _copy_sendfile(src, dst, size, on_chunk=None):
+    """In-kernel copy through the page cache, without user-space buffers"""
+    if not hasattr(os, 'sendfile') or not sys.platform.startswith('linux'):
+        raise CopyUnsupported("sendfile")
+    chunk = KERNEL_COPY_CHUNK if on_chunk is None else CALLBACK_CHUNK
+    offset = 0
+    while offset < size:
+        sent = os.sendfile(dst.fileno(), src.fileno(), offset, min(size - offset, chunk))
+        if sent == 0:
+            raise OSError(errno.EIO, "sendfile stopped early")
+        offset += sent
+        if on_chunk is not None:
+            on_chunk(offset)
+
+
+_buffers = threading.local()
+
+
+def _copy_buffer():
+    """Return this thread's preallocated copy buffer and a view of it"""
+    if not hasattr(_buffers, 'buffer'):
+        _buffers.buffer = bytearray(COPY_BUFFER_SIZE)
+        _buffers.view = memoryview(_buffers.buffer)
+    return _buffers.buffer, _buffers.view
+
+
+def _copy_buffered(src, dst, size, on_chunk=None, hasher=None):
+    """Portable read/write loop, optionally hashing the bytes as they pass.
+
+    Uses one preallocated buffer per thread, so no memory is allocated per
+    chunk or per copy.
+    """
+    buffer, view = _copy_buffer()
+    done = 0
+    while True:
+        read = src.readinto(buffer)
+        if not read:
+            break
+        chunk = view[:read]
+        if hasher is not None:
+            hasher.update(chunk)
+        written = 0
+        while written < read:  # Raw writes may be partial
+            written += dst.write(chunk[written:])
+        done += read
+        if on_chunk is not None:
+            on_chunk(done)
+
+
+# Tried in order; the first one that works for a pair of files wins
+COPY_STRATEGIES = (
+    ("reflink", _copy_reflink),
+    ("copy_file_range", _copy_file_range),
+    ("sendfile", _copy_sendfile),
+    ("buffered", _copy_buffered),
+)
+
+
+def copy_stream(src, dst, strategies=COPY_STRATEGIES, on_chunk=None):
+    """Copy all data from open file ``src`` to empty open file ``dst``.
+
+    Both must be unbuffered binary files. Strategies that are unavailable
+    or refuse this pair of files are skipped, after undoing anything they
+    wrote. ``on_chunk``, if given, is called with the bytes copied so far
+    after every chunk. Returns the name of the strategy that did the copy.
+    """
+    size = os.fstat(src.fileno()).st_size
+    for name, strategy in strategies:
+        try:
+            strategy(src, dst, size, on_chunk)
+            return name
+        except (CopyUnsupported, OSError) as e:
+            if isinstance(e, OSError) and not _unsupported(e):
+                raise
+            src.seek(0)
+            dst.seek(0)
+            dst.truncate()
+    raise CopyUnsupported("no copy strategy could copy the file")
+
+
+def copy_and_hash(src, dst, on_chunk=None):
+    """Copy open file ``src`` to ``dst`` in one pass, returning the SHA-256.
+
+    The digest is of the exact bytes written, so checking it against a
+    known digest of the source verifies the copy without reading either
+    file a second time.
+    """
+    hasher = hashlib.sha256()
+    _copy_buffered(src, dst, None, on_chunk, hasher)
+    return hasher.hexdigest()
+
+
+def copy_file(source_path, dest_path, strategies=COPY_STRATEGIES, progress=None, cancel=None):
+    """Copy a file's data and metadata, returning the strategy used.
+
+    ``progress`` and ``cancel`` are as for ``stage_copy``.
+    """
+    with open(source_path, 'rb', buffering=0) as src, open(dest_path, 'wb', buffering=0) as dst:
+        on_chunk = _chunk_hook(progress, cancel, os.fstat(src.fileno()).st_size)
+        strategy = copy_stream(src, dst, strategies, on_chunk)
+    shutil.copystat(source_path, dest_path)
+    return strategy
+
+
+def fsync_directory(path):
+    """Flush a directory entry change to disk where the OS allows it"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # Windows cannot open directories; NTFS journals renames itself
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def stage_copy(source_path, directory, with_digest=False, progress=None, cancel=None,
+               on_created=None):
+    """Copy ``source_path`` into a new temp file in ``directory``.
+
+    The data and metadata are fsynced before returning, so the staged file
+    can be renamed over a target at any point afterwards. Staging in the
+    target's own directory keeps that rename on one filesystem, where it is
+    atomic. With ``with_digest`` the bytes are hashed while being copied
+    (forgoing the kernel copy paths). ``progress``, if given, receives
+    throttled ``(done, total, bytes_per_second, eta_seconds)`` updates.
+    A ``CancelToken`` is checked between chunks; on ``Cancelled`` the temp
+    file is removed. ``on_created``, if given, is called with the temp
+    file path before any data is copied. Returns the temp file path, the
+    copy strategy used and the digest (or None); the caller owns (and must
+    rename or remove) the temp file.
+    """
+    fd, staged_path = tempfile.mkstemp(prefix=STAGING_PREFIX, suffix=STAGING_SUFFIX,
+                                       dir=directory)
+    digest = None
+    try:
+        if on_created is not None:
+            on_created(staged_path)
+        with os.fdopen(fd, 'wb', buffering=0) as dst, open(source_path, 'rb', buffering=0) as src:
+            on_chunk = _chunk_hook(progress, cancel, os.fstat(src.fileno()).st_size)
+            if with_digest:
+                digest = copy_and_hash(src, dst, on_chunk)
+                strategy = "buffered+sha256"
+            else:
+                strategy = copy_stream(src, dst, on_chunk=on_chunk)
+            os.fsync(dst.fileno())
+        shutil.copystat(source_path, staged_path)
+    except BaseException:
+        discard(staged_path)
+        raise
+    return staged_path, strategy, digest
+
+
+def commit(staged_path, target_path):
+    """Atomically move a staged file over its target"""
+    os.replace(staged_path, target_path)
+    fsync_directory(os.path.dirname(os.path.abspath(target_path)))
+
+
+def discard(staged_path):
+    """Remove a staged file, ignoring one that is already gone"""
+    try:
+        os.remove(staged_path)
+    except FileNotFoundError:
+        pass
+
+
+def replace_atomic(source_path, target_path, progress=None, cancel=None):
+    """Copy ``source_path`` over ``target_path`` via a staged temp file.
+
+    Readers see either the old file or the complete new one, never a
+    partial write, and a crash leaves at most a stray temp file behind.
+    Hardlinks to the old target (such as backup blobs) keep the old bytes.
+    Returns the copy strategy used.
+    """
+    staged_path, strategy, _ = stage_copy(source_path,
+                                          os.path.dirname(os.path.abspath(target_path)),
+                                          progress=progress, cancel=cancel)
+    try:
+        commit(staged_path, target_path)
+    except BaseException:
+        discard(staged_path)
+        raise
+    return strategy
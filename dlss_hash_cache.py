@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NVIDIA DLSS Updater - Hash Cache
+Persistent SHA-256 cache keyed by (path, size, mtime_ns)
+"""
+
+import os
+import sys
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Constants
+HASH_CHUNK_SIZE = 1024 * 1024
+CACHE_FILE_NAME = "dlss_hash_cache.json"
+CACHE_FORMAT_VERSION = 1
+DEFAULT_MAX_ENTRIES = 512
+
+
+def file_digest(path, cancel=None):
+    """Return the SHA-256 hex digest of a file, read in fixed-size chunks.
+
+    ``cancel`` (a CancelToken) is checked between chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            if cancel is not None:
+                cancel.check()
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def default_cache_dir():
+    """Directory next to the executable (or script) where the cache lives"""
+    return os.path.dirname(os.path.abspath(sys.argv[0]))
+
+
+class HashCache:
+    """SHA-256 digests of files, remembered across runs.
+
+    An entry is only trusted while the file's size and mtime_ns are
+    unchanged, so a repeat run on an untouched machine never re-reads the
+    file. The cache is bounded to ``max_entries`` with least-recently-used
+    eviction and is safe to share between worker threads.
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        if path is None:
+            path = os.path.join(default_cache_dir(), CACHE_FILE_NAME)
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def load(self):
+        """Load entries from disk, ignoring a missing or unreadable file"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != CACHE_FORMAT_VERSION:
+                return
+            entries = OrderedDict()
+            for path, size, mtime_ns, digest in data.get("entries", []):
+                entries[path] = (size, mtime_ns, digest)
+        except (OSError, ValueError, TypeError, AttributeError):
+            return  # Start with an empty cache
+        with self._lock:
+            self._entries.update(entries)
+
+    def save(self):
+        """Write the cache to disk if it changed (atomically, via rename)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = [[path, size, mtime_ns, digest]
+                       for path, (size, mtime_ns, digest) in self._entries.items()]
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": CACHE_FORMAT_VERSION, "entries": entries}, f)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass  # The cache is an optimization; never fail a run over it
+
+    def lookup(self, path):
+        """Return the cached digest of ``path`` without reading it, or None"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = self._key(path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[:2] != (st.st_size, st.st_mtime_ns):
+                return None
+            self._entries.move_to_end(key)
+            return entry[2]
+
+    def record(self, path, digest):
+        """Remember ``digest`` as the hash of the file currently at ``path``"""
+        st = os.stat(path)
+        key = self._key(path)
+        with self._lock:
+            self._entries[key] = (st.st_size, st.st_mtime_ns, digest)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def digest(self, path, cancel=None):
+        """Return the digest of ``path``, hashing it only on a cache miss"""
+        digest = self.lookup(path)
+        if digest is None:
+            digest = file_digest(path, cancel)
+            self.record(path, digest)
+        return digest
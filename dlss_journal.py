@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NVIDIA DLSS Updater - Update Journal
+Write-ahead log of in-flight .bin replacements, for recovery after a crash
+"""
+
+import os
+import json
+import threading
+from dataclasses import dataclass
+
+from dlss_backup_store import STATE_DIR_NAME
+from dlss_fileops import fsync_directory
+
+# Constants
+JOURNAL_FILE_NAME = "journal.jsonl"
+
+
+@dataclass
+class JournalEntry:
+    """A replacement that was started but never recorded as done or aborted"""
+    target_path: str
+    staged_path: str
+    sha256: str = None  # Of the source (new) bytes, when known up front
+    backup_sha256: str = None  # Of the original, once a backup was started
+    ready: bool = False  # Every step before the rename succeeded
+
+
+class Journal:
+    """Append-only record of each replacement's phases under one models root.
+
+    A replacement writes ``begin`` when its staged temp file is created,
+    before any data is copied into it, ``backup`` (with the original's
+    digest) before the original goes into the backup store, ``ready``
+    when only the rename is left, and finally ``done`` or ``abort``.
+    Every record is fsynced before the step it announces, so after a
+    crash the journal tells which phase each open replacement reached.
+    Records are keyed by target path, relative to the models root; only
+    one replacement per target runs at a time. The file is truncated
+    whenever no replacement is open.
+    """
+
+    def __init__(self, models_root):
+        self.models_root = models_root
+        self.path = os.path.join(models_root, STATE_DIR_NAME, JOURNAL_FILE_NAME)
+        self._lock = threading.Lock()
+        self._open = set()
+
+    def begin(self, target_path, staged_path, sha256=None):
+        """Record a staged replacement of ``target_path``"""
+        target = self._relative(target_path)
+        self._append({"op": "begin", "target": target,
+                      "staged": self._relative(staged_path), "sha256": sha256}, opened=target)
+
+    def backup(self, target_path, sha256):
+        """Record that the original, with digest ``sha256``, is about to be backed up"""
+        self._append({"op": "backup", "target": self._relative(target_path), "sha256": sha256})
+
+    def ready(self, target_paths):
+        """Record that these replacements may be committed, all together"""
+        self._append({"op": "ready", "targets": [self._relative(path) for path in target_paths]})
+
+    def done(self, target_path):
+        """Record that the staged file was renamed over its target"""
+        self._close(target_path, "done")
+
+    def abort(self, target_path):
+        """Record that the staged file was discarded and the original kept"""
+        self._close(target_path, "abort")
+
+    def pending(self):
+        """Replay the journal and return the replacements left open, in order"""
+        entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return []
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A record torn by the crash; its step never ran
+            op = record.get("op")
+            if op == "begin":
+                entries[record["target"]] = JournalEntry(
+                    os.path.join(self.models_root, record["target"]),
+                    os.path.join(self.models_root, record["staged"]), record.get("sha256"))
+            elif op == "backup" and record["target"] in entries:
+                entries[record["target"]].backup_sha256 = record["sha256"]
+            elif op == "ready":
+                for target in record["targets"]:
+                    if target in entries:
+                        entries[target].ready = True
+            elif op in ("done", "abort"):
+                entries.pop(record["target"], None)
+        return list(entries.values())
+
+    def clear(self, keep=()):
+        """Empty the journal, except for the entries in ``keep``
+
+        Kept entries are rewritten as they were replayed, so they are
+        still open for the next recovery.
+        """
+        with self._lock:
+            self._open.clear()
+            if not keep:
+                self._truncate()
+                return
+            lines = []
+            for entry in keep:
+                target = self._relative(entry.target_path)
+                lines.append({"op": "begin", "target": target,
+                              "staged": self._relative(entry.staged_path), "sha256": entry.sha256})
+                if entry.backup_sha256 is not None:
+                    lines.append({"op": "backup", "target": target, "sha256": entry.backup_sha256})
+                if entry.ready:
+                    lines.append({"op": "ready", "targets": [target]})
+                self._open.add(target)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(record) + "\n" for record in lines)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            fsync_directory(os.path.dirname(self.path))
+
+    def _relative(self, path):
+        return os.path.relpath(path, self.models_root)
+
+    def _close(self, target_path, op):
+        # Best effort: an entry left open is found settled by recovery
+        target = self._relative(target_path)
+        try:
+            self._append({"op": op, "target": target}, closed=target)
+        except OSError:
+            with self._lock:
+                self._open.discard(target)
+                if not self._open:
+                    try:
+                        self._truncate()
+                    except OSError:
+                        pass
+
+    def _append(self, record, opened=None, closed=None):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            created = not os.path.exists(self.path)
+            if created:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            if created:
+                fsync_directory(os.path.dirname(self.path))
+            if opened is not None:
+                self._open.add(opened)
+            if closed is not None:
+                self._open.discard(closed)
+                if not self._open:
+                    self._truncate()
+
+    def _truncate(self):
+        try:
+            with open(self.path, 'r+', encoding='utf-8') as f:
+                f.truncate()
+                os.fsync(f.fileno())
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NVIDIA DLSS Updater - PE Version Reader
+Reads a DLL's file version from its VS_VERSIONINFO resource via mmap
+"""
+
+import mmap
+import struct
+
+# Constants
+RT_VERSION = 16
+RESOURCE_DIRECTORY_INDEX = 2
+VS_FIXEDFILEINFO_SIGNATURE = 0xFEEF04BD
+VS_VERSION_INFO_KEY = "VS_VERSION_INFO\0".encode('utf-16-le')
+MAX_VERSION_RESOURCE_SIZE = 64 * 1024
+
+
+class PEFormatError(ValueError):
+    """The file is not a PE image, or its version resource is malformed"""
+
+
+class _PEImage:
+    """Just enough of a PE parser to walk to the version resource.
+
+    All reads are small ``struct.unpack_from`` calls on the mapping, so
+    only the pages holding the headers, the section table and the
+    resource tree are ever faulted in, however large the file is.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        if self._read('<2s', 0)[0] != b'MZ':
+            raise PEFormatError("missing MZ header")
+        pe_offset = self._read('<I', 0x3C)[0]
+        if self._read('<4s', pe_offset)[0] != b'PE\0\0':
+            raise PEFormatError("missing PE signature")
+
+        coff_offset = pe_offset + 4
+        section_count, optional_size = self._read('<2xH12xH', coff_offset)
+        optional_offset = coff_offset + 20
+        magic = self._read('<H', optional_offset)[0]
+        if magic == 0x10B:    # PE32
+            directories_offset = optional_offset + 96
+        elif magic == 0x20B:  # PE32+
+            directories_offset = optional_offset + 112
+        else:
+            raise PEFormatError(f"unknown optional header magic {magic:#x}")
+        directory_count = self._read('<I', directories_offset - 4)[0]
+        if directory_count <= RESOURCE_DIRECTORY_INDEX:
+            raise PEFormatError("no resource directory")
+        self.resource_rva, self.resource_size = self._read(
+            '<II', directories_offset + 8 * RESOURCE_DIRECTORY_INDEX)
+
+        self.sections = []
+        section_offset = optional_offset + optional_size
+        for index in range(section_count):
+            virtual_size, virtual_address, raw_size, raw_offset = self._read(
+                '<8xIIII', section_offset + 40 * index)
+            self.sections.append((virtual_address, max(virtual_size, raw_size), raw_offset))
+
+    def _read(self, fmt, offset):
+        if offset < 0 or offset + struct.calcsize(fmt) > len(self.data):
+            raise PEFormatError("read past end of file")
+        return struct.unpack_from(fmt, self.data, offset)
+
+    def rva_to_offset(self, rva):
+        """Translate a relative virtual address to a file offset"""
+        for virtual_address, size, raw_offset in self.sections:
+            if virtual_address <= rva < virtual_address + size:
+                return raw_offset + rva - virtual_address
+        raise PEFormatError(f"RVA {rva:#x} is outside every section")
+
+    def _resource_entries(self, directory_offset):
+        """Yield (id_or_name, offset_to_data) of a resource directory"""
+        named, ids = self._read('<12xHH', directory_offset)
+        for index in range(named + ids):
+            yield self._read('<II', directory_offset + 16 + 8 * index)
+
+    def version_resource(self):
+        """Return the bytes of the first RT_VERSION resource"""
+        if not self.resource_rva:
+            raise PEFormatError("no resources")
+        base = self.rva_to_offset(self.resource_rva)
+
+        offset = base
+        for level in range(3):  # Type -> name -> language
+            for name, target in self._resource_entries(offset):
+                if level > 0 or name == RT_VERSION:
+                    break
+            else:
+                raise PEFormatError("no version resource")
+            is_directory = bool(target & 0x80000000)
+            if is_directory != (level < 2):
+                raise PEFormatError("unexpected resource tree shape")
+            offset = base + (target & 0x7FFFFFFF)
+
+        data_rva, size = self._read('<II', offset)
+        start = self.rva_to_offset(data_rva)
+        size = min(size, MAX_VERSION_RESOURCE_SIZE)
+        if start + size > len(self.data):
+            raise PEFormatError("version resource past end of file")
+        return self.data[start:start + size]
+
+
+def parse_fixed_file_version(resource):
+    """Return the (major, minor, build, revision) file version of a VS_VERSIONINFO blob"""
+    if resource[6:6 + len(VS_VERSION_INFO_KEY)] != VS_VERSION_INFO_KEY:
+        raise PEFormatError("not a VS_VERSIONINFO resource")
+    # The key is followed by padding to a 32-bit boundary, then VS_FIXEDFILEINFO
+    offset = (6 + len(VS_VERSION_INFO_KEY) + 3) & ~3
+    if len(resource) < offset + 16:
+        raise PEFormatError("truncated VS_FIXEDFILEINFO")
+    signature, _, version_ms, version_ls = struct.unpack_from('<IIII', resource, offset)
+    if signature != VS_FIXEDFILEINFO_SIGNATURE:
+        raise PEFormatError("bad VS_FIXEDFILEINFO signature")
+    return (version_ms >> 16, version_ms & 0xFFFF, version_ls >> 16, version_ls & 0xFFFF)
+
+
+def read_file_version(path):
+    """Return the file version of a PE file as a 4-tuple, or None if unreadable.
+
+    The file is memory-mapped, so a multi-hundred-MB DLL costs a handful
+    of page reads rather than a full read.
+    """
+    try:
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return parse_fixed_file_version(_PEImage(data).version_resource())
+    except (OSError, ValueError):
+        return None
+
+
+def format_version(version):
+    """Format a version tuple as text, e.g. (310, 2, 1, 0) -> "310.2.1" """
+    if version is None:
+        return "unknown"
+    if version[3] == 0:
+        version = version[:3]
+    return ".".join(str(part) for part in version)
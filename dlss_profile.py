@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NVIDIA DLSS Updater - Phase Profiler
+Totals the engine's timed steps per model and phase
+"""
+
+# Constants
+PHASE_ORDER = ("scan", "inspect", "compare", "copy", "verify", "backup", "commit", "restore")
+
+
+class PhaseProfiler:
+    """Engine listener that adds up "step" events by (model, phase).
+
+    Only the step events' own perf_counter_ns durations are used, so the
+    profiler adds no timing calls of its own to the hot path.
+    """
+
+    def __init__(self):
+        self.totals = {}  # (model, phase) -> [calls, duration_ns, bytes]
+
+    def __call__(self, event):
+        if event.kind != "step":
+            return
+        key = (event.data.get("model_name", "-"), event.data["step"])
+        total = self.totals.setdefault(key, [0, 0, 0])
+        total[0] += 1
+        total[1] += event.data["duration_ns"]
+        total[2] += event.data["bytes"]
+
+    def rows(self):
+        """Return (model, phase, calls, duration_ns, bytes) rows in pipeline order"""
+        def order(key):
+            model, phase = key
+            rank = PHASE_ORDER.index(phase) if phase in PHASE_ORDER else len(PHASE_ORDER)
+            return model, rank, phase
+        return [(model, phase, *self.totals[(model, phase)])
+                for model, phase in sorted(self.totals, key=order)]
+
+    def report(self):
+        """Format the breakdown as table lines, with a total per model"""
+        lines = [f"{'Model':<7} {'Phase':<9} {'Calls':>5} {'Time ms':>10} {'MB':>9} {'MB/s':>9}"]
+
+        def line(model, phase, calls, duration_ns, size):
+            mb = size / (1024 * 1024)
+            rate = f"{mb / (duration_ns / 1e9):9.1f}" if size and duration_ns else f"{'-':>9}"
+            return (f"{model:<7} {phase:<9} {calls:>5} {duration_ns / 1e6:>10.2f} "
+                    f"{mb:>9.2f} {rate}")
+
+        model_total = None
+        for model, phase, calls, duration_ns, size in self.rows():
+            if model_total is not None and model_total[0] != model:
+                lines.append(line(model_total[0], "total", *model_total[1:]))
+                model_total = None
+            if model_total is None:
+                model_total = [model, 0, 0, 0]
+            model_total[1] += calls
+            model_total[2] += duration_ns
+            model_total[3] += size
+            lines.append(line(model, phase, calls, duration_ns, size))
+        if model_total is not None:
+            lines.append(line(model_total[0], "total", *model_total[1:]))
+        return lines
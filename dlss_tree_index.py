@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NVIDIA DLSS Updater - Tree Index
+In-process cache of each model's latest version folder and its files
+"""
+
+import os
+import json
+import fnmatch
+import threading
+from dataclasses import dataclass, field, replace
+
+
+def find_latest_version(versions_path):
+    """Find the latest numeric version directory.
+
+    A single ``os.scandir`` pass keeps a running maximum. Only names that
+    beat it are checked with ``DirEntry.is_dir()``, which usually answers
+    from the directory listing itself without another stat.
+    """
+    latest_number = -1
+    latest_path = None
+    try:
+        with os.scandir(versions_path) as entries:
+            for entry in entries:
+                # Check if it's a numeric folder name
+                if not entry.name.isdecimal():
+                    continue
+                number = int(entry.name)
+                if number > latest_number and entry.is_dir():
+                    latest_number = number
+                    latest_path = entry.path
+    except OSError:
+        return None
+    return latest_path
+
+
+def _manifest_names(path):
+    """Return every file name mentioned by string values of a JSON file"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return set()
+    names = set()
+    pending = [data]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, list):
+            pending.extend(value)
+        elif isinstance(value, str):
+            names.add(value.replace('\\', '/').rsplit('/', 1)[-1])
+    return names
+
+
+def select_target(bin_sizes, manifest_names=(), target_glob=None):
+    """Pick the .bin to update from a files folder's candidates.
+
+    ``bin_sizes`` maps candidate names to sizes. A ``target_glob`` given
+    by the user wins, then a file named by an NVIDIA App manifest, then
+    the largest file; remaining ties go to the first name in sorted order.
+    Returns ``(name, reason)``; the name is None when ``target_glob``
+    matches nothing.
+    """
+    if target_glob:
+        candidates = [name for name in bin_sizes if fnmatch.fnmatch(name, target_glob)]
+        reason = "glob"
+    else:
+        candidates = [name for name in bin_sizes if name in manifest_names]
+        reason = "manifest"
+        if not candidates:
+            candidates = list(bin_sizes)
+            reason = "only" if len(candidates) == 1 else "largest"
+    if not candidates:
+        return None, reason
+    return min(candidates, key=lambda name: (-bin_sizes[name], name)), reason
+
+
+def _mtime_ns(path):
+    """Return a directory's mtime_ns, or None if it does not exist"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+@dataclass
+class ModelIndex:
+    """What one model's latest version folder held when it was last scanned"""
+    model_name: str
+    versions_path: str
+    versions_mtime_ns: int = None  # None: the versions folder is missing
+    version_name: str = ""
+    files_path: str = ""
+    files_mtime_ns: int = None  # None: the files folder is missing
+    bin_sizes: dict = field(default_factory=dict)  # .bin name -> size
+    manifest_names: set = field(default_factory=set)  # File names in JSON manifests
+    legacy_backups: list = field(default_factory=list)  # Names of .bin.bak files, sorted
+
+
+class TreeIndex:
+    """Models, latest versions, .bin candidates and legacy backups of a models root.
+
+    Built lazily, once per process, and shared by every engine operation.
+    An entry is reused while the mtime of its versions folder (which
+    changes when version folders come or go) and of its files folder
+    (which changes when files there are created, renamed or deleted) is
+    unchanged, so checking it costs two stats instead of two listings.
+    Entries are replaced rather than modified, so a caller can keep one
+    while another thread rescans.
+    """
+
+    def __init__(self, models_root):
+        self.models_root = models_root
+        self.scans = 0  # Directory listings performed
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def versions_path(self, model_name):
+        """Return the versions directory of a model"""
+        return os.path.join(self.models_root, model_name, "versions")
+
+    def model(self, model_name):
+        """Return the index of a model, rescanning only what changed on disk"""
+        with self._lock:
+            cached = self._models.get(model_name)
+            versions_mtime = _mtime_ns(self.versions_path(model_name))
+            if cached is None or cached.versions_mtime_ns != versions_mtime:
+                cached = self._scan_versions(model_name, versions_mtime)
+            elif cached.files_path and _mtime_ns(cached.files_path) != cached.files_mtime_ns:
+                cached = self._scan_files(cached)
+            self._models[model_name] = cached
+            return cached
+
+    def invalidate(self, model_name=None):
+        """Forget one model (or every model), forcing a rescan on next use"""
+        with self._lock:
+            if model_name is None:
+                self._models.clear()
+            else:
+                self._models.pop(model_name, None)
+
+    def _scan_versions(self, model_name, versions_mtime):
+        index = ModelIndex(model_name, self.versions_path(model_name), versions_mtime)
+        if versions_mtime is None:
+            return index
+        self.scans += 1
+        latest_version_path = find_latest_version(index.versions_path)
+        if not latest_version_path:
+            return index
+        index.version_name = os.path.basename(latest_version_path)
+        index.files_path = os.path.join(latest_version_path, "files")
+        return self._scan_files(index)
+
+    def _scan_files(self, index):
+        # Take the mtime before listing, so a change during the scan is
+        # seen as a change next time
+        files_mtime = _mtime_ns(index.files_path)
+        bin_sizes, manifest_names, legacy_backups = {}, set(), []
+        if files_mtime is not None:
+            self.scans += 1
+            try:
+                with os.scandir(index.files_path) as entries:
+                    for entry in entries:
+                        if entry.name.endswith('.bin') and entry.is_file():
+                            bin_sizes[entry.name] = entry.stat().st_size
+                        elif entry.name.endswith('.bin.bak'):
+                            legacy_backups.append(entry.name)
+                        elif entry.name.lower().endswith('.json'):
+                            manifest_names |= _manifest_names(entry.path)
+            except OSError:
+                files_mtime = None
+        return replace(index, files_mtime_ns=files_mtime, bin_sizes=bin_sizes,
+                       manifest_names=manifest_names, legacy_backups=sorted(legacy_backups))
@@ -5,23 +5,61 @@ NVIDIA DLSS Updater - GUI Application
 Updates NVIDIA App's DLSS source files with custom DLL versions
 """
 
-import os
-import sys
-import shutil
+import queue
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, scrolledtext
 import threading
 import ctypes
-import re
-from pathlib import Path
-from datetime import datetime
 
-# Constants
-NVIDIA_BASE_PATH = r"C:\ProgramData\NVIDIA\NGX\models"
-MODEL_MAP = {
-    "nvngx_dlss.dll": "dlss",
-    "nvngx_dlssg.dll": "dlssg",
-    "nvngx_dlssd.dll": "dlssd"
+from dlss_engine import DEFAULT_MODELS_ROOT, MODEL_MAP, DLSSUpdaterEngine
+from dlss_fileops import CancelToken
+from dlss_hash_cache import HashCache
+
+# Log text for each engine event kind; kinds not listed are not logged
+MESSAGES = {
+    "processing": "处理 / Processing: {dll_name}\n",
+    "source_missing": "✗ 源文件不存在 / Source file not found: {source_path}\n",
+    "versions_missing": "✗ 未找到版本目录 / Versions directory not found: {versions_path}\n",
+    "no_version": "✗ 未找到有效版本 / No valid version found\n",
+    "latest_version": "找到最新版本 / Found latest version: {version_name}\n",
+    "files_missing": "✗ 未找到 files 目录 / Files directory not found\n",
+    "no_bin": "✗ 未找到 .bin 文件 / No .bin file found\n",
+    "no_bin_match": "✗ 没有匹配 {target_glob} 的 .bin 文件 / No .bin file matches {target_glob}\n",
+    "target": "目标文件 / Target file: {target_path}\n",
+    "dll_versions": "版本 / Version: source {source_version} → installed {installed_version}\n",
+    "downgrade_refused": "✗ 拒绝降级 / Refusing to downgrade {installed_version} to {source_version}\n"
+                         "  勾选“允许降级”以安装旧版本 / Tick \"Allow downgrade\" to install an older version\n",
+    "already_current": "✓ 文件已是最新，无需更新 / Already current, nothing to do\n",
+    "backup_created": "✓ 已创建备份 / Backup created: {backup_path} ({method})\n",
+    "backup_failed": "✗ 备份失败 / Backup failed: {error}\n",
+    "replaced": "✓ 成功替换文件 / File replaced successfully!\n",
+    "replace_failed": "✗ 替换失败 / Replacement failed: {error}\n",
+    "verify_failed": "✗ 校验失败 / Verification failed: {actual}\n",
+    "scan_directory": "正在扫描目录 / Scanning directory: {directory}\n",
+    "dll_found": "✓ 找到 / Found: {dll_name} ({version})\n",
+    "dll_not_found": "✗ 未找到 / Not found: {dll_name}\n",
+    "restored": "✓ 已恢复 / Restored: {target_path}\n",
+    "manifest_unreadable": "⚠ 备份清单无法读取 / Backup manifest unreadable:\n{error}\n",
+    "restore_failed": "✗ 恢复失败 / Restore failed: {target_path}\n{error}\n",
+    "cancelled": "⚠ 已取消 / Cancelled\n",
+    "rolled_back": "✓ 已回滚 / Rolled back: {target_path}\n",
+    "rollback_unavailable": "⚠ 无备份，无法回滚 / No backup to roll back: {target_path}\n",
+    "rollback_failed": "✗ 回滚失败 / Rollback failed: {target_path}\n{error}\n",
+    "recovery_rolled_forward": "✓ 已完成上次中断的更新 / Completed interrupted update: {target_path}\n",
+    "recovery_rolled_back": "✓ 已撤销上次中断的更新 / Undid interrupted update: {target_path}\n",
+    "recovery_failed": "✗ 无法恢复上次中断的更新 / Cannot recover interrupted update: {target_path}\n{error}\n",
+}
+
+# Log pipeline: worker threads queue lines, the Tk loop inserts them in batches
+LOG_POLL_MS = 50
+LOG_BATCH_SIZE = 500
+MAX_LOG_LINES = 5000
+
+# Log text tag for each engine event status
+STATUS_TAGS = {
+    "SUCCESS": "success",
+    "WARNING": "warning",
+    "ERROR": "error",
 }
 
 class NvidiaDLSSUpdater:
@@ -40,9 +78,18 @@ class NvidiaDLSSUpdater:
         # Variables
         self.dll_files = {}
         self.is_admin = self.check_admin()
+        self.log_queue = queue.Queue()
+        self.hash_cache = HashCache()
+        self.engine = DLSSUpdaterEngine(DEFAULT_MODELS_ROOT, listener=self.handle_event,
+                                        hash_cache=self.hash_cache)
         
         # Create GUI
         self.create_widgets()
+        self.root.after(LOG_POLL_MS, self.drain_log)
+        
+        # Settle any update a previous run was interrupted in
+        if self.is_admin:
+            self.engine.recover()
         
         # Check admin status
         if not self.is_admin:
@@ -106,6 +153,13 @@ class NvidiaDLSSUpdater:
                                    command=self.auto_detect_dlls)
         auto_detect_btn.grid(row=row, column=0, columnspan=3, pady=(10, 0))
         
+        # Installing an older DLL (e.g. to pin a DLSS version) must be asked for
+        self.allow_downgrade = tk.BooleanVar(value=False)
+        downgrade_check = ttk.Checkbutton(file_frame,
+                                          text="允许降级到旧版本 / Allow downgrade to an older version",
+                                          variable=self.allow_downgrade)
+        downgrade_check.grid(row=row + 1, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+        
         # Log output frame
         log_frame = ttk.LabelFrame(main_frame, text="操作日志 / Operation Log", padding="10")
         log_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 20))
@@ -136,19 +190,30 @@ class NvidiaDLSSUpdater:
         # Restore backup button
         self.restore_btn = ttk.Button(button_frame, 
                                      text="恢复备份 / Restore Backup", 
-                                     command=self.restore_backup,
+                                     command=self.start_restore,
                                      state=tk.NORMAL if self.is_admin else tk.DISABLED)
         self.restore_btn.grid(row=0, column=1, padx=5)
         
+        # Cancel button, enabled only while an update or restore runs
+        self.cancel_btn = ttk.Button(button_frame, 
+                                    text="取消 / Cancel", 
+                                    command=self.cancel_operation,
+                                    state=tk.DISABLED)
+        self.cancel_btn.grid(row=0, column=2, padx=5)
+        
         # Exit button
         exit_btn = ttk.Button(button_frame, text="退出 / Exit", command=self.root.quit)
-        exit_btn.grid(row=0, column=2, padx=5)
+        exit_btn.grid(row=0, column=3, padx=5)
         
         # Status bar
         self.status_var = tk.StringVar()
         self.status_var.set("就绪 / Ready")
         status_bar = ttk.Label(main_frame, textvariable=self.status_var, relief=tk.SUNKEN)
-        status_bar.grid(row=4, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
+        status_bar.grid(row=4, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
+        
+        # Copy progress, next to the status bar
+        self.progress = ttk.Progressbar(main_frame, mode='determinate', maximum=100, length=200)
+        self.progress.grid(row=4, column=1, sticky=tk.E, padx=(10, 0), pady=(10, 0))
     
     def browse_file(self, entry, dll_name):
         """Browse for DLL file"""
@@ -163,21 +228,13 @@ class NvidiaDLSSUpdater:
     
     def auto_detect_dlls(self):
         """Auto-detect DLL files in current directory"""
-        current_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
-        found_count = 0
-        
-        self.log_message(f"正在扫描目录 / Scanning directory: {current_dir}\n", "info")
-        
-        for dll_name in MODEL_MAP.keys():
-            dll_path = os.path.join(current_dir, dll_name)
-            if os.path.exists(dll_path):
-                self.dll_files[dll_name].delete(0, tk.END)
-                self.dll_files[dll_name].insert(0, dll_path)
-                self.log_message(f"✓ 找到 / Found: {dll_name}\n", "success")
-                found_count += 1
-            else:
-                self.log_message(f"✗ 未找到 / Not found: {dll_name}\n", "warning")
+        found_dlls = self.engine.auto_detect_dlls()
         
+        for dll_name, dll_path in found_dlls.items():
+            self.dll_files[dll_name].delete(0, tk.END)
+            self.dll_files[dll_name].insert(0, dll_path)
+        
+        found_count = len(found_dlls)
         if found_count > 0:
             self.log_message(f"\n自动检测完成，找到 {found_count} 个文件。\n", "success")
             self.log_message(f"Auto-detection complete, found {found_count} file(s).\n", "success")
@@ -186,102 +243,62 @@ class NvidiaDLSSUpdater:
             self.log_message("No DLL files found.\n", "warning")
     
     def log_message(self, message, msg_type="info"):
-        """Add message to log"""
-        self.log_text.insert(tk.END, message, msg_type)
+        """Queue a message for the log (safe from any thread)"""
+        self.log_queue.put(("log", message, msg_type))
+    
+    def call_in_ui(self, callback, *args):
+        """Run a widget update on the Tk thread, in order with queued log lines"""
+        self.log_queue.put(("call", callback, args))
+    
+    def drain_log(self):
+        """Insert queued log lines, then check again shortly"""
+        self.flush_log(LOG_BATCH_SIZE)
+        self.root.after(LOG_POLL_MS, self.drain_log)
+    
+    def flush_log(self, limit=None):
+        """Insert up to ``limit`` queued lines with one widget insert per batch"""
+        pending = []  # Alternating text, tag pairs for a single Text.insert
+        processed = 0
+        while limit is None or processed < limit:
+            try:
+                kind, payload, extra = self.log_queue.get_nowait()
+            except queue.Empty:
+                break
+            processed += 1
+            if kind == "log":
+                pending.extend((payload, extra))
+            else:
+                self.insert_log(pending)
+                pending = []
+                payload(*extra)
+        self.insert_log(pending)
+    
+    def insert_log(self, pending):
+        """Append text/tag pairs, dropping the oldest lines beyond MAX_LOG_LINES"""
+        if not pending:
+            return
+        self.log_text.insert(tk.END, *pending)
+        line_count = int(self.log_text.index('end-1c').split('.')[0])
+        if line_count > MAX_LOG_LINES:
+            self.log_text.delete('1.0', f'{line_count - MAX_LOG_LINES + 1}.0')
         self.log_text.see(tk.END)
-        self.root.update_idletasks()
     
-    def find_latest_version(self, versions_path):
-        """Find the latest version directory"""
-        if not os.path.exists(versions_path):
-            return None
-        
-        version_dirs = []
-        for item in os.listdir(versions_path):
-            item_path = os.path.join(versions_path, item)
-            if os.path.isdir(item_path):
-                # Check if it's a numeric folder name
-                if re.match(r'^\d+$', item):
-                    version_dirs.append((int(item), item_path))
-        
-        if not version_dirs:
-            return None
-        
-        # Sort by numeric value and get the latest
-        version_dirs.sort(key=lambda x: x[0], reverse=True)
-        return version_dirs[0][1]
+    def clear_log(self):
+        """Empty the log, including lines still waiting in the queue"""
+        self.flush_log()
+        self.log_text.delete(1.0, tk.END)
     
-    def update_single_dll(self, dll_name, source_path):
-        """Update a single DLL file"""
-        model_name = MODEL_MAP[dll_name]
-        
-        self.log_message(f"\n{'='*50}\n", "info")
-        self.log_message(f"处理 / Processing: {dll_name}\n", "info")
-        
-        # Check if source file exists
-        if not os.path.exists(source_path):
-            self.log_message(f"✗ 源文件不存在 / Source file not found: {source_path}\n", "error")
-            return False
-        
-        # Construct versions path
-        versions_path = os.path.join(NVIDIA_BASE_PATH, model_name, "versions")
-        
-        if not os.path.exists(versions_path):
-            self.log_message(f"✗ 未找到版本目录 / Versions directory not found: {versions_path}\n", "error")
-            return False
-        
-        # Find latest version
-        latest_version_path = self.find_latest_version(versions_path)
-        
-        if not latest_version_path:
-            self.log_message(f"✗ 未找到有效版本 / No valid version found\n", "error")
-            return False
-        
-        version_name = os.path.basename(latest_version_path)
-        self.log_message(f"找到最新版本 / Found latest version: {version_name}\n", "info")
-        
-        # Construct files path
-        files_path = os.path.join(latest_version_path, "files")
-        
-        if not os.path.exists(files_path):
-            self.log_message(f"✗ 未找到 files 目录 / Files directory not found\n", "error")
-            return False
-        
-        # Find .bin file
-        bin_files = [f for f in os.listdir(files_path) if f.endswith('.bin')]
-        
-        if not bin_files:
-            self.log_message(f"✗ 未找到 .bin 文件 / No .bin file found\n", "error")
-            return False
-        
-        bin_file = bin_files[0]
-        bin_file_path = os.path.join(files_path, bin_file)
-        
-        self.log_message(f"目标文件 / Target file: {bin_file_path}\n", "info")
-        
-        # Create backup
-        try:
-            backup_path = f"{bin_file_path}.bak"
-            backup_path_dated = f"{bin_file_path}.bak.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            
-            # Create dated backup
-            shutil.copy2(bin_file_path, backup_path_dated)
-            # Create simple backup (for easy restore)
-            shutil.copy2(bin_file_path, backup_path)
-            
-            self.log_message(f"✓ 已创建备份 / Backup created: {backup_path}\n", "success")
-        except Exception as e:
-            self.log_message(f"✗ 备份失败 / Backup failed: {str(e)}\n", "error")
-            return False
-        
-        # Replace file
-        try:
-            shutil.copy2(source_path, bin_file_path)
-            self.log_message(f"✓ 成功替换文件 / File replaced successfully!\n", "success")
-            return True
-        except Exception as e:
-            self.log_message(f"✗ 替换失败 / Replacement failed: {str(e)}\n", "error")
-            return False
+    def handle_event(self, event):
+        """Render an engine event in the log"""
+        if event.kind == "copy_progress":
+            self.call_in_ui(self.show_progress, event.data)
+            return
+        template = MESSAGES.get(event.kind)
+        if template is None:
+            return
+        if event.kind == "processing":
+            self.log_message(f"\n{'='*50}\n", "info")
+        self.log_message(template.format(**event.data), STATUS_TAGS.get(event.status, "info"))
     
     def start_update(self):
         """Start the update process"""
@@ -289,33 +306,38 @@ class NvidiaDLSSUpdater:
             messagebox.showerror("权限错误", "需要管理员权限才能执行此操作！\nAdministrator privileges required!")
             return
         
-        # Disable button during update
-        self.update_btn.config(state=tk.DISABLED)
-        self.status_var.set("正在更新... / Updating...")
+        self.engine.allow_downgrade = self.allow_downgrade.get()
+        # Read the entries here: Tk widgets may only be touched from this thread
+        sources = {}
+        for dll_name, entry in self.dll_files.items():
+            source_path = entry.get().strip()
+            if source_path:
+                sources[dll_name] = source_path
         
         # Clear log
-        self.log_text.delete(1.0, tk.END)
+        self.clear_log()
+        
+        # Disable buttons during update
+        self.set_busy(True, "正在更新... / Updating...")
         self.log_message("开始更新过程... / Starting update process...\n\n", "info")
         
         # Run update in thread to prevent GUI freezing
-        thread = threading.Thread(target=self.perform_update)
+        thread = threading.Thread(target=self.perform_update, args=(sources,))
         thread.start()
     
-    def perform_update(self):
-        """Perform the actual update"""
-        success_count = 0
-        total_count = 0
-        
-        for dll_name, entry in self.dll_files.items():
-            source_path = entry.get().strip()
-            if source_path:
-                total_count += 1
-                if self.update_single_dll(dll_name, source_path):
-                    success_count += 1
+    def perform_update(self, sources):
+        """Perform the actual update of ``sources`` ({dll_name: path})"""
+        results = self.engine.update_many(sources)
+        success_count = sum(1 for result in results if result.success)
+        total_count = len(results)
         
         # Summary
         self.log_message(f"\n{'='*50}\n", "info")
-        if total_count == 0:
+        if self.engine.cancel_token.cancelled:
+            self.log_message("更新已取消，本次已替换的模型已回滚。\n", "warning")
+            self.log_message("Update cancelled; models replaced in this run were rolled back.\n",
+                             "warning")
+        elif total_count == 0:
             self.log_message("未选择任何文件进行更新。\n", "warning")
             self.log_message("No files selected for update.\n", "warning")
         else:
@@ -328,12 +350,42 @@ class NvidiaDLSSUpdater:
                 self.log_message("\n现在您可以打开 NVIDIA App 并应用 DLSS 配置到游戏。\n", "info")
                 self.log_message("You can now open NVIDIA App and apply DLSS profiles to your games.\n", "info")
         
-        # Re-enable button
-        self.update_btn.config(state=tk.NORMAL)
-        self.status_var.set("就绪 / Ready")
+        self.hash_cache.save()
+        
+        # Re-enable buttons
+        self.call_in_ui(self.set_busy, False)
+    
+    def show_progress(self, data):
+        """Show a copy's progress in the progress bar and status bar"""
+        self.progress['value'] = data["percent"]
+        name = data.get("dll_name") or data.get("target_name", "")
+        eta = "--" if data["eta"] is None else f"{data['eta']:.0f}s"
+        self.status_var.set(f"复制 / Copying {name}: {data['percent']:.0f}%  "
+                            f"{data['mb_per_s']:.1f} MB/s  ETA {eta}")
+    
+    def set_busy(self, busy, status="就绪 / Ready"):
+        """Disable the action buttons while a worker thread runs.
+
+        Each run gets a fresh cancel token, and the Cancel button is only
+        enabled while the run is in progress.
+        """
+        state = tk.DISABLED if busy else tk.NORMAL
+        self.update_btn.config(state=state)
+        self.restore_btn.config(state=state)
+        self.cancel_btn.config(state=tk.NORMAL if busy else tk.DISABLED)
+        if busy:
+            self.engine.cancel_token = CancelToken()
+        self.status_var.set(status)
+        self.progress['value'] = 0
+    
+    def cancel_operation(self):
+        """Ask the running update or restore to stop and roll back"""
+        self.engine.cancel_token.cancel()
+        self.cancel_btn.config(state=tk.DISABLED)
+        self.status_var.set("正在取消... / Cancelling...")
     
-    def restore_backup(self):
-        """Restore from backup files"""
+    def start_restore(self):
+        """Confirm, then restore from backup files on a worker thread"""
         if not self.is_admin:
             messagebox.showerror("权限错误", "需要管理员权限才能执行此操作！\nAdministrator privileges required!")
             return
@@ -344,36 +396,18 @@ class NvidiaDLSSUpdater:
         if not result:
             return
         
-        self.log_text.delete(1.0, tk.END)
+        self.clear_log()
+        self.set_busy(True, "正在恢复... / Restoring...")
         self.log_message("开始恢复备份... / Starting backup restoration...\n\n", "info")
         
-        restored_count = 0
-        
-        for model_name in MODEL_MAP.values():
-            versions_path = os.path.join(NVIDIA_BASE_PATH, model_name, "versions")
-            if not os.path.exists(versions_path):
-                continue
-            
-            latest_version_path = self.find_latest_version(versions_path)
-            if not latest_version_path:
-                continue
-            
-            files_path = os.path.join(latest_version_path, "files")
-            if not os.path.exists(files_path):
-                continue
-            
-            # Find backup files
-            for file_name in os.listdir(files_path):
-                if file_name.endswith('.bin.bak'):
-                    backup_path = os.path.join(files_path, file_name)
-                    original_path = backup_path[:-4]  # Remove .bak
-                    
-                    try:
-                        shutil.copy2(backup_path, original_path)
-                        self.log_message(f"✓ 已恢复 / Restored: {original_path}\n", "success")
-                        restored_count += 1
-                    except Exception as e:
-                        self.log_message(f"✗ 恢复失败 / Restore failed: {original_path}\n{str(e)}\n", "error")
+        thread = threading.Thread(target=self.perform_restore)
+        thread.start()
+    
+    def perform_restore(self):
+        """Perform the actual restore"""
+        results = self.engine.restore_backups()
+        restored_count = sum(1 for result in results if result.success)
+        self.hash_cache.save()
         
         if restored_count > 0:
             self.log_message(f"\n恢复完成: 已恢复 {restored_count} 个文件。\n", "success")
@@ -381,6 +415,8 @@ class NvidiaDLSSUpdater:
         else:
             self.log_message("\n未找到备份文件。\n", "warning")
             self.log_message("No backup files found.\n", "warning")
+        
+        self.call_in_ui(self.set_busy, False)
 
 def main():
     """Main entry point"""
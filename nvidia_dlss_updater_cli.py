@@ -7,28 +7,101 @@ Updates NVIDIA App's DLSS source files with custom DLL versions
 
 import os
 import sys
-import shutil
+import json
 import argparse
 import ctypes
-import re
-from pathlib import Path
-from datetime import datetime
+import signal
+import cProfile
+import threading
+from contextlib import contextmanager
+from dataclasses import asdict
 from colorama import init, Fore, Back, Style
 
+from dlss_engine import (DEFAULT_MODELS_ROOT, MODEL_MAP, DLSSUpdaterEngine, combined_exit_code,
+                         exit_code, update_roots)
+from dlss_event_log import JsonLinesLog
+from dlss_fileops import CancelToken
+from dlss_profile import PhaseProfiler
+from dlss_hash_cache import CACHE_FILE_NAME, HashCache, default_cache_dir
+
 # Initialize colorama for Windows color support
 init(autoreset=True)
 
-# Constants
-NVIDIA_BASE_PATH = r"C:\ProgramData\NVIDIA\NGX\models"
-MODEL_MAP = {
-    "nvngx_dlss.dll": "dlss",
-    "nvngx_dlssg.dll": "dlssg",
-    "nvngx_dlssd.dll": "dlssd"
+# Console text for each engine event kind; kinds not listed are not printed
+MESSAGES = {
+    "processing": "Processing: {dll_name}",
+    "source_missing": "Source file not found: {source_path}",
+    "source": "Source: {source_path}",
+    "versions_missing": "Versions directory not found: {versions_path}",
+    "no_version": "No valid version found",
+    "latest_version": "Latest version: {version_name}",
+    "files_missing": "Files directory not found",
+    "no_bin": "No .bin file found",
+    "no_bin_match": "No .bin file matches --target-glob {target_glob} (found: {candidates})",
+    "target": "Target: {target_path}",
+    "dll_versions": "Version: source {source_version} → installed {installed_version}",
+    "downgrade_refused": "Refusing to downgrade {installed_version} to {source_version} (use --allow-downgrade)",
+    "already_current": "Already current, nothing to do",
+    "backup_created": "Backup created: {backup_name} ({method})",
+    "backup_failed": "Backup failed: {error}",
+    "replaced": "File replaced successfully! (copy: {strategy})",
+    "replace_failed": "Replacement failed: {error}",
+    "verify_failed": "Verification failed: copied bytes do not match the source (expected {expected}, got {actual})",
+    "scan_directory": "Scanning directory: {directory}",
+    "dll_found": "Found: {dll_name} ({version})",
+    "restore_start": "Starting backup restoration...",
+    "restored": "Restored: {target_name}",
+    "restore_planned": "Would restore: {target_name} from {backup_path}",
+    "restore_failed": "Restore failed: {target_name} - {error}",
+    "update_error": "Update failed: {error}",
+    "cancelled": "Cancelled",
+    "rolled_back": "Rolled back: {target_path}",
+    "rollback_unavailable": "Cannot roll back {target_path}: no backup was made (--no-backup)",
+    "rollback_failed": "Rollback failed: {target_path} - {error}",
+    "recovery_rolled_forward": "Completed an interrupted update: {target_path}",
+    "recovery_rolled_back": "Undid an interrupted update: {target_path}",
+    "recovery_failed": "Cannot recover an interrupted update of {target_path}: {error} (try --restore)",
+    "transaction_aborted": "Transaction aborted ({failed}); no model was changed",
+    "transaction_committed": "Transaction committed: {count} model(s) replaced",
+    "gc_start": "Collecting old backups...",
+    "gc_removed": "{path} ({size} bytes)",
+    "gc_model": "{model_name}: {count} backup(s), {reclaimed_mb:.1f} MB",
+    "gc_failed": "{model_name}: {error}",
+    "manifest_unreadable": "{error}",
 }
 
+PROGRESS_BAR_WIDTH = 30
+
+# Events about the source DLLs rather than any models root
+SOURCE_EVENTS = {"scan_directory", "dll_found", "dll_not_found"}
+
+def read_roots_file(path):
+    """Read models roots from a file: one per line, blank lines and # comments ignored"""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith('#')]
+
 class NvidiaDLSSUpdaterCLI:
-    def __init__(self):
+    def __init__(self, models_root=DEFAULT_MODELS_ROOT, jobs=1, cache_dir=None, verify=True,
+                 allow_downgrade=False, target_glob=None, roots=None, root_jobs=1,
+                 transactional=False):
         self.is_admin = self.check_admin()
+        self.jobs = jobs
+        self.root_jobs = root_jobs
+        self.quiet = False
+        self.event_log = None
+        self.profiler = None
+        self.progress_open = False
+        self._event_lock = threading.Lock()
+        self.hash_cache = HashCache(os.path.join(cache_dir or default_cache_dir(), CACHE_FILE_NAME))
+        # One engine per models root; they share the hash cache
+        self.engines = [DLSSUpdaterEngine(root, listener=self.root_listener(root),
+                                          hash_cache=self.hash_cache, verify=verify,
+                                          allow_downgrade=allow_downgrade,
+                                          target_glob=target_glob,
+                                          transactional=transactional)
+                        for root in roots or [models_root]]
+        self.engine = self.engines[0]
         
     def check_admin(self):
         """Check if running as administrator"""
@@ -46,6 +119,13 @@ class NvidiaDLSSUpdaterCLI:
     
     def print_status(self, message, status="INFO"):
         """Print formatted status message"""
+        if self.progress_open:
+            # End an unfinished progress bar line first
+            print()
+            self.progress_open = False
+        if self.quiet:
+            print(message, file=sys.stderr)
+            return
         if status == "SUCCESS":
             print(f"{Fore.GREEN}[✓] {message}")
         elif status == "ERROR":
@@ -57,151 +137,190 @@ class NvidiaDLSSUpdaterCLI:
         else:
             print(f"    {message}")
     
-    def find_latest_version(self, versions_path):
-        """Find the latest version directory"""
-        if not os.path.exists(versions_path):
-            return None
-        
-        version_dirs = []
-        for item in os.listdir(versions_path):
-            item_path = os.path.join(versions_path, item)
-            if os.path.isdir(item_path):
-                # Check if it's a numeric folder name
-                if re.match(r'^\d+$', item):
-                    version_dirs.append((int(item), item_path))
-        
-        if not version_dirs:
-            return None
-        
-        # Sort by numeric value and get the latest
-        version_dirs.sort(key=lambda x: x[0], reverse=True)
-        return version_dirs[0][1]
+    def root_listener(self, models_root):
+        """Return the event listener for the engine of one models root"""
+        def listener(event):
+            if len(self.engines) > 1 and event.kind not in SOURCE_EVENTS:
+                event.data.setdefault("models_root", models_root)
+            self.handle_event(event)
+        return listener
     
-    def update_single_dll(self, dll_name, source_path, create_backup=True):
-        """Update a single DLL file"""
-        model_name = MODEL_MAP[dll_name]
-        
-        print(f"\n{Fore.CYAN}{'='*50}")
-        self.print_status(f"Processing: {dll_name}", "INFO")
-        
-        # Check if source file exists
-        if not os.path.exists(source_path):
-            self.print_status(f"Source file not found: {source_path}", "ERROR")
-            return False
-        
-        self.print_status(f"Source: {source_path}", "")
-        
-        # Construct versions path
-        versions_path = os.path.join(NVIDIA_BASE_PATH, model_name, "versions")
-        
-        if not os.path.exists(versions_path):
-            self.print_status(f"Versions directory not found: {versions_path}", "ERROR")
-            return False
-        
-        # Find latest version
-        latest_version_path = self.find_latest_version(versions_path)
-        
-        if not latest_version_path:
-            self.print_status("No valid version found", "ERROR")
-            return False
-        
-        version_name = os.path.basename(latest_version_path)
-        self.print_status(f"Latest version: {version_name}", "")
-        
-        # Construct files path
-        files_path = os.path.join(latest_version_path, "files")
-        
-        if not os.path.exists(files_path):
-            self.print_status("Files directory not found", "ERROR")
-            return False
-        
-        # Find .bin file
-        bin_files = [f for f in os.listdir(files_path) if f.endswith('.bin')]
-        
-        if not bin_files:
-            self.print_status("No .bin file found", "ERROR")
-            return False
-        
-        bin_file = bin_files[0]
-        bin_file_path = os.path.join(files_path, bin_file)
-        
-        self.print_status(f"Target: {bin_file_path}", "")
+    def handle_event(self, event):
+        """Render an engine event as a status line, and log/profile it if enabled"""
+        # Engines of different roots emit concurrently
+        with self._event_lock:
+            if self.event_log is not None:
+                self.event_log(event)
+            if self.profiler is not None:
+                self.profiler(event)
+            if event.kind == "copy_progress":
+                self.print_progress(event.data)
+                return
+            template = MESSAGES.get(event.kind)
+            if template is None or self.quiet:
+                return
+            message = template.format(**event.data)
+            if event.kind == "processing":
+                print(f"\n{Fore.CYAN}{'='*50}")
+            elif self.jobs > 1 and "dll_name" in event.data:
+                # Parallel output interleaves, so say which DLL each line is about
+                message = f"[{event.data['dll_name']}] {message}"
+            if "models_root" in event.data:
+                message = f"[{event.data['models_root']}] {message}"
+            self.print_status(message, event.status)
+    
+    @contextmanager
+    def cancel_on_ctrl_c(self):
+        """While active, Ctrl-C cancels the running operation cleanly.
+
+        The first Ctrl-C triggers the engines' cancel token, so copies stop
+        at their next chunk and replaced models are rolled back; a second
+        one interrupts immediately.
+        """
+        token = CancelToken()
         
-        # Create backup if requested
-        if create_backup:
-            try:
-                backup_path = f"{bin_file_path}.bak"
-                backup_path_dated = f"{bin_file_path}.bak.{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-                
-                # Create dated backup
-                shutil.copy2(bin_file_path, backup_path_dated)
-                # Create simple backup (for easy restore)
-                shutil.copy2(bin_file_path, backup_path)
-                
-                self.print_status(f"Backup created: {os.path.basename(backup_path)}", "SUCCESS")
-            except Exception as e:
-                self.print_status(f"Backup failed: {str(e)}", "ERROR")
-                return False
+        def on_interrupt(signum, frame):
+            if token.cancelled:
+                raise KeyboardInterrupt
+            token.cancel()
+            self.print_status("Cancelling... (press Ctrl-C again to abort immediately)", "WARNING")
         
-        # Replace file
+        for engine in self.engines:
+            engine.cancel_token = token
+        previous = signal.signal(signal.SIGINT, on_interrupt)
         try:
-            shutil.copy2(source_path, bin_file_path)
-            self.print_status("File replaced successfully!", "SUCCESS")
-            return True
-        except Exception as e:
-            self.print_status(f"Replacement failed: {str(e)}", "ERROR")
-            return False
+            yield token
+        finally:
+            signal.signal(signal.SIGINT, previous)
+            for engine in self.engines:
+                engine.cancel_token = None
     
-    def auto_detect_dlls(self, directory=None):
-        """Auto-detect DLL files in specified or current directory"""
-        if directory is None:
-            directory = os.path.dirname(os.path.abspath(sys.argv[0]))
-        
-        found_dlls = {}
+    def print_progress(self, data):
+        """Redraw the single-line copy progress bar"""
+        # Parallel copies would fight over the line, and files/pipes get no bar
+        if self.quiet or self.jobs > 1 or len(self.engines) > 1 or not sys.stdout.isatty():
+            return
+        filled = int(PROGRESS_BAR_WIDTH * data["percent"] / 100)
+        bar = "#" * filled + "-" * (PROGRESS_BAR_WIDTH - filled)
+        if data["eta"] is None:
+            eta = "--:--"
+        else:
+            eta = f"{int(data['eta']) // 60:02d}:{int(data['eta']) % 60:02d}"
+        mb = 1024 * 1024
+        sys.stdout.write(f"\r    [{bar}] {data['percent']:5.1f}%  "
+                         f"{data['done'] / mb:.1f}/{data['total'] / mb:.1f} MB  "
+                         f"{data['mb_per_s']:.1f} MB/s  ETA {eta}  ")
+        sys.stdout.flush()
+        self.progress_open = data["done"] < data["total"]
+        if not self.progress_open:
+            sys.stdout.write("\n")
+    
+    def update_dlls(self, dll_files, create_backup=True):
+        """Update the DLLs, returning one result per DLL"""
+        return self.engine.update_many(dll_files, create_backup, self.jobs)
+    
+    def restore_backups(self):
+        """Restore all files from backup"""
+        results = self.engine.restore_backups()
+        return sum(1 for result in results if result.success)
+    
+    def run_gc(self, args):
+        """Delete old backups according to the retention flags"""
+        if args.keep_last is None and args.keep_days is None and args.max_size is None:
+            self.print_status("--gc needs --keep-last, --keep-days and/or --max-size", "ERROR")
+            return 1
         
-        self.print_status(f"Scanning directory: {directory}", "INFO")
+        max_bytes = None if args.max_size is None else int(args.max_size * 1024 * 1024)
+        results = self.engine.collect_garbage(args.keep_last, args.keep_days, max_bytes,
+                                              args.dry_run)
         
-        for dll_name in MODEL_MAP.keys():
-            dll_path = os.path.join(directory, dll_name)
-            if os.path.exists(dll_path):
-                found_dlls[dll_name] = dll_path
-                self.print_status(f"Found: {dll_name}", "SUCCESS")
+        if args.json:
+            print(json.dumps({"models_root": self.engine.models_root,
+                              "dry_run": args.dry_run,
+                              "gc": [asdict(result) for result in results]}, indent=2))
         
-        return found_dlls
+        reclaimed_mb = sum(result.reclaimed_bytes for result in results) / (1024 * 1024)
+        removed = sum(len(result.removed) for result in results)
+        if args.dry_run:
+            self.print_status(f"Dry run: would delete {removed} backup(s), reclaiming {reclaimed_mb:.1f} MB", "INFO")
+        else:
+            self.print_status(f"Deleted {removed} backup(s), reclaimed {reclaimed_mb:.1f} MB", "SUCCESS")
+        return 1 if any(result.errors for result in results) else 0
     
-    def restore_backups(self):
-        """Restore all files from backup"""
-        self.print_status("Starting backup restoration...", "INFO")
+    def run_plan(self, args):
+        """Show what an update would do (--plan / --dry-run), changing nothing"""
+        dll_files = self.collect_dll_files(args)
+        if not dll_files:
+            self.print_status("No valid DLL files specified", "ERROR")
+            return 1
         
-        restored_count = 0
+        if len(self.engines) > 1:
+            plans = [(engine.models_root, engine.plan_updates(dll_files, not args.no_backup))
+                     for engine in self.engines]
+            if args.json:
+                print(json.dumps({"dry_run": True,
+                                  "create_backup": not args.no_backup,
+                                  "roots": [{"models_root": root,
+                                             "plan": [asdict(entry) for entry in plan]}
+                                            for root, plan in plans]}, indent=2))
+            else:
+                for root, plan in plans:
+                    print(f"\n{Fore.CYAN}{root}")
+                    self.print_plan(plan)
+            return 0
         
-        for model_name in MODEL_MAP.values():
-            versions_path = os.path.join(NVIDIA_BASE_PATH, model_name, "versions")
-            if not os.path.exists(versions_path):
-                continue
-            
-            latest_version_path = self.find_latest_version(versions_path)
-            if not latest_version_path:
-                continue
-            
-            files_path = os.path.join(latest_version_path, "files")
-            if not os.path.exists(files_path):
-                continue
-            
-            # Find backup files
-            for file_name in os.listdir(files_path):
-                if file_name.endswith('.bin.bak'):
-                    backup_path = os.path.join(files_path, file_name)
-                    original_path = backup_path[:-4]  # Remove .bak
-                    
-                    try:
-                        shutil.copy2(backup_path, original_path)
-                        self.print_status(f"Restored: {os.path.basename(original_path)}", "SUCCESS")
-                        restored_count += 1
-                    except Exception as e:
-                        self.print_status(f"Restore failed: {os.path.basename(original_path)} - {str(e)}", "ERROR")
+        plan = self.engine.plan_updates(dll_files, not args.no_backup)
+        if args.json:
+            print(json.dumps({"models_root": self.engine.models_root,
+                              "dry_run": True,
+                              "create_backup": not args.no_backup,
+                              "plan": [asdict(entry) for entry in plan]}, indent=2))
+        else:
+            self.print_plan(plan)
+        return 0
+    
+    def run_roots(self, dll_files, create_backup=True):
+        """Update every models root, printing a summary line per root"""
+        summaries = update_roots(self.engines, dll_files, create_backup, self.jobs, self.root_jobs)
         
-        return restored_count
+        print(f"\n{Fore.CYAN}{'='*50}")
+        for summary in summaries:
+            success_count = sum(1 for result in summary.results if result.success)
+            if summary.error:
+                self.print_status(f"{summary.models_root}: {summary.error}", "ERROR")
+            else:
+                status = {0: "SUCCESS", 2: "WARNING"}.get(summary.exit_code, "ERROR")
+                self.print_status(f"{summary.models_root}: {success_count}/{len(dll_files)} successful", status)
+        
+        code = combined_exit_code(summary.exit_code for summary in summaries)
+        failed_roots = sum(1 for summary in summaries if summary.exit_code != 0)
+        if code == 0:
+            self.print_status(f"All roots updated ({len(summaries)})", "SUCCESS")
+        elif code == 2:
+            self.print_status(f"{failed_roots} of {len(summaries)} root(s) not fully updated", "WARNING")
+        else:
+            self.print_status("All roots failed", "ERROR")
+        return code
+    
+    def run_restore(self, args):
+        """Restore from backup (--restore), or list what would be restored"""
+        results = self.engine.restore_backups(args.dry_run)
+        restored = sum(1 for result in results if result.success)
+        
+        if args.json:
+            print(json.dumps({"models_root": self.engine.models_root,
+                              "dry_run": args.dry_run,
+                              "restore": [asdict(result) for result in results]}, indent=2))
+        
+        if args.dry_run:
+            self.print_status(f"Dry run: would restore {len(results)} file(s)", "INFO")
+            return 0
+        if restored > 0:
+            self.print_status(f"Restored {restored} file(s)", "SUCCESS")
+            return 0
+        else:
+            self.print_status("No backup files found", "ERROR")
+            return 1
     
     def run_interactive(self):
         """Run in interactive mode"""
@@ -228,17 +347,19 @@ class NvidiaDLSSUpdaterCLI:
             
             if choice == '1':
                 # Auto-detect and update
-                found_dlls = self.auto_detect_dlls()
+                found_dlls = self.engine.auto_detect_dlls()
                 if found_dlls:
                     print(f"\n{Fore.YELLOW}Found {len(found_dlls)} DLL file(s).")
                     confirm = input("Proceed with update? (y/n): ").strip().lower()
                     if confirm == 'y':
-                        success_count = 0
-                        for dll_name, dll_path in found_dlls.items():
-                            if self.update_single_dll(dll_name, dll_path):
-                                success_count += 1
+                        with self.cancel_on_ctrl_c() as token:
+                            results = self.update_dlls(found_dlls)
+                        success_count = sum(1 for result in results if result.success)
                         
-                        print(f"\n{Fore.GREEN}Update complete: {success_count}/{len(found_dlls)} successful")
+                        if token.cancelled:
+                            self.print_status("Update cancelled", "WARNING")
+                        else:
+                            print(f"\n{Fore.GREEN}Update complete: {success_count}/{len(found_dlls)} successful")
                 else:
                     self.print_status("No DLL files found in current directory", "WARNING")
             
@@ -251,12 +372,14 @@ class NvidiaDLSSUpdaterCLI:
                         dll_files[dll_name] = path
                 
                 if dll_files:
-                    success_count = 0
-                    for dll_name, dll_path in dll_files.items():
-                        if self.update_single_dll(dll_name, dll_path):
-                            success_count += 1
+                    with self.cancel_on_ctrl_c() as token:
+                        results = self.update_dlls(dll_files)
+                    success_count = sum(1 for result in results if result.success)
                     
-                    print(f"\n{Fore.GREEN}Update complete: {success_count}/{len(dll_files)} successful")
+                    if token.cancelled:
+                        self.print_status("Update cancelled", "WARNING")
+                    else:
+                        print(f"\n{Fore.GREEN}Update complete: {success_count}/{len(dll_files)} successful")
                 else:
                     self.print_status("No valid files specified", "WARNING")
             
@@ -264,7 +387,8 @@ class NvidiaDLSSUpdaterCLI:
                 # Restore backup
                 confirm = input(f"\n{Fore.YELLOW}Restore all files from backup? (y/n): ").strip().lower()
                 if confirm == 'y':
-                    restored = self.restore_backups()
+                    with self.cancel_on_ctrl_c():
+                        restored = self.restore_backups()
                     if restored > 0:
                         self.print_status(f"Restored {restored} file(s)", "SUCCESS")
                     else:
@@ -279,34 +403,33 @@ class NvidiaDLSSUpdaterCLI:
         
         return 0
     
-    def run_cli(self, args):
-        """Run with command line arguments"""
-        self.print_header()
-        
-        # Check admin privileges
-        if not self.is_admin:
-            self.print_status("Administrator privileges required!", "ERROR")
-            return 1
-        
-        if args.restore:
-            # Restore mode
-            restored = self.restore_backups()
-            if restored > 0:
-                self.print_status(f"Restored {restored} file(s)", "SUCCESS")
-                return 0
-            else:
-                self.print_status("No backup files found", "ERROR")
-                return 1
-        
-        # Update mode
+    def print_profile(self):
+        """Print the per-model, per-phase timing breakdown (--profile)"""
+        # Keep stdout clean when it carries JSON
+        stream = sys.stderr if self.quiet else sys.stdout
+        print("\nProfile (per model and phase):", file=stream)
+        for line in self.profiler.report():
+            print(line, file=stream)
+    
+    def print_plan(self, plan):
+        """Print an update plan as an aligned table"""
+        print(f"\n{'Model':<7} {'Action':<20} {'Source':<14} {'Installed':<14} {'Steps':<30} Target")
+        for entry in plan:
+            action = entry.action if entry.allowed or entry.action != "downgrade" else "downgrade (refused)"
+            target = entry.target_path or entry.error
+            if len(entry.target_candidates) > 1 and entry.target_path:
+                target += f" ({entry.target_selected_by} of {len(entry.target_candidates)})"
+            steps = ", ".join(entry.actions) or "-"
+            print(f"{entry.model_name:<7} {action:<20} {entry.source_version:<14} "
+                  f"{entry.installed_version:<14} {steps:<30} {target}")
+    
+    def collect_dll_files(self, args):
+        """Return the DLLs named on the command line, or auto-detected"""
         dll_files = {}
         
         if args.auto:
             # Auto-detect mode
-            dll_files = self.auto_detect_dlls(args.directory)
-            if not dll_files:
-                self.print_status("No DLL files found", "ERROR")
-                return 1
+            dll_files = self.engine.auto_detect_dlls(args.directory)
         else:
             # Manual specification
             if args.dlss and os.path.exists(args.dlss):
@@ -316,25 +439,73 @@ class NvidiaDLSSUpdaterCLI:
             if args.dlssd and os.path.exists(args.dlssd):
                 dll_files["nvngx_dlssd.dll"] = args.dlssd
         
-        if not dll_files:
-            self.print_status("No valid DLL files specified", "ERROR")
+        return dll_files
+    
+    def run_cli(self, args):
+        """Run with command line arguments"""
+        if args.log_format == "jsonl" and not args.log_file:
+            if args.json:
+                self.print_status("--json and --log-format jsonl cannot both use stdout; add --log-file", "ERROR")
+                return 1
+            # Keep stdout pure JSON lines
+            self.quiet = True
+        elif args.json:
+            # Keep stdout a single JSON document
+            self.quiet = True
+        else:
+            self.print_header()
+        
+        # Plans and dry runs only read, so they do not need elevation
+        if (args.gc or args.restore) and len(self.engines) > 1:
+            self.print_status("--gc and --restore take a single models root", "ERROR")
             return 1
+        if args.dry_run and args.gc:
+            return self.run_gc(args)
+        if args.dry_run and args.restore:
+            return self.run_restore(args)
+        if args.plan or args.dry_run:
+            return self.run_plan(args)
         
-        # Perform update
-        success_count = 0
-        for dll_name, dll_path in dll_files.items():
-            if self.update_single_dll(dll_name, dll_path, not args.no_backup):
-                success_count += 1
+        # Check admin privileges
+        if not self.is_admin:
+            self.print_status("Administrator privileges required!", "ERROR")
+            return 1
+        
+        if args.gc:
+            return self.run_gc(args)
+        
+        if args.restore:
+            with self.cancel_on_ctrl_c():
+                return self.run_restore(args)
         
-        if success_count == len(dll_files):
+        # Update mode
+        dll_files = self.collect_dll_files(args)
+        
+        if not dll_files:
+            self.print_status("No DLL files found" if args.auto else "No valid DLL files specified", "ERROR")
+            return 1
+        
+        with self.cancel_on_ctrl_c() as token:
+            if len(self.engines) > 1:
+                return self.run_roots(dll_files, not args.no_backup)
+            
+            # Perform update
+            results = self.update_dlls(dll_files, not args.no_backup)
+        success_count = sum(1 for result in results if result.success)
+        
+        code = exit_code(results)
+        rolled_back = sum(1 for result in results if result.rolled_back)
+        if token.cancelled and rolled_back:
+            self.print_status(f"Update cancelled; {rolled_back} replaced model(s) rolled back", "WARNING")
+        elif token.cancelled:
+            self.print_status("Update cancelled", "WARNING")
+        elif code == 0:
             self.print_status(f"All updates successful ({success_count}/{len(dll_files)})", "SUCCESS")
-            return 0
-        elif success_count > 0:
+        elif code == 2:
             self.print_status(f"Partial success ({success_count}/{len(dll_files)})", "WARNING")
-            return 2
         else:
             self.print_status("All updates failed", "ERROR")
-            return 1
+        return code
 
 def main():
     """Main entry point"""
@@ -346,7 +517,17 @@ Examples:
   %(prog)s --auto                     # Auto-detect DLLs in current directory
   %(prog)s --auto -d C:\\path\\to\\dlls  # Auto-detect DLLs in specified directory
   %(prog)s --dlss nvngx_dlss.dll      # Update specific DLL
+  %(prog)s --auto --jobs 3            # Update all models in parallel
+  %(prog)s --auto --plan --json       # Show the update plan as JSON
+  %(prog)s --auto --dry-run --json    # Resolve everything, write nothing, print JSON
   %(prog)s --restore                  # Restore from backup
+  %(prog)s --auto --log-format jsonl  # Stream per-step events as JSON lines
+  %(prog)s --auto --log-file run.jsonl  # Also append the event log to a file
+  %(prog)s --auto --profile           # Print time and MB/s per model and phase
+  %(prog)s --gc --keep-last 3 --dry-run  # Preview deleting all but 3 backups per model
+  %(prog)s --auto --models-root D:\\staged\\models  # Use another NGX models root
+  %(prog)s --auto --root E:\\models --root F:\\models  # Update several roots concurrently
+  %(prog)s --auto --roots-file roots.txt --root-jobs 8  # Roots listed one per line
   %(prog)s                            # Interactive mode
         """
     )
@@ -365,16 +546,91 @@ Examples:
                        help='Do not create backup files')
     parser.add_argument('--restore', '-r', action='store_true',
                        help='Restore files from backup')
+    parser.add_argument('--models-root', type=str, default=DEFAULT_MODELS_ROOT,
+                       help=f'NGX models root directory (default: {DEFAULT_MODELS_ROOT})')
+    parser.add_argument('--root', action='append', default=[], metavar='PATH',
+                       help='Models root to update; repeat for several (overrides --models-root)')
+    parser.add_argument('--roots-file', type=str, metavar='PATH',
+                       help='File listing models roots, one per line (# comments allowed)')
+    parser.add_argument('--root-jobs', type=int, default=4, metavar='N',
+                       help='Update up to N models roots at a time (default: 4)')
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                       help='Update up to N models in parallel (default: 1)')
+    parser.add_argument('--gc', action='store_true',
+                       help='Delete old backups (use with --keep-last/--keep-days/--max-size)')
+    parser.add_argument('--keep-last', type=int, metavar='N',
+                       help='With --gc: keep the N newest backups of each model')
+    parser.add_argument('--keep-days', type=float, metavar='DAYS',
+                       help='With --gc: keep backups newer than DAYS days')
+    parser.add_argument('--max-size', type=float, metavar='MB',
+                       help='With --gc: keep at most MB megabytes of backups per model')
+    parser.add_argument('--plan', action='store_true',
+                       help='Show what the update would do for each model, without changing anything')
+    parser.add_argument('--json', action='store_true',
+                       help='With --plan/--dry-run/--gc/--restore: print one JSON document to stdout')
+    parser.add_argument('--allow-downgrade', action='store_true',
+                       help='Install a DLL even if it is older than the installed one')
+    parser.add_argument('--dry-run', action='store_true',
+                       help='Show what would be done without changing anything')
+    parser.add_argument('--no-verify', action='store_true',
+                       help='Do not hash the replacement while copying (allows zero-copy kernel copies)')
+    parser.add_argument('--transactional', action='store_true',
+                       help='Replace every model or none: stage and verify all first, then commit with renames only')
+    parser.add_argument('--target-glob', type=str, metavar='PATTERN',
+                       help='Update the .bin matching PATTERN when files/ holds several (default: manifest, else largest)')
+    parser.add_argument('--cache-dir', type=str,
+                       help='Directory for the file hash cache (default: next to the program)')
+    parser.add_argument('--log-format', choices=['text', 'jsonl'], default='text',
+                       help='jsonl: write every engine event (with step timings) as JSON lines')
+    parser.add_argument('--log-file', type=str, metavar='PATH',
+                       help='Append the JSON-lines event log to PATH instead of stdout (implies --log-format jsonl)')
+    
+    parser.add_argument('--profile', action='store_true',
+                       help='At exit, print time and throughput per model and phase')
+    parser.add_argument('--profile-out', type=str, metavar='PATH',
+                       help='With --profile: also dump cProfile stats to PATH (main thread only; use --jobs 1)')
     
     args = parser.parse_args()
+    if args.log_file:
+        args.log_format = 'jsonl'
+    if args.profile_out:
+        args.profile = True
+    
+    roots = list(args.root)
+    if args.roots_file:
+        try:
+            roots.extend(read_roots_file(args.roots_file))
+        except OSError as e:
+            print(f"{Fore.RED}[✗] Cannot read roots file: {e}")
+            return 1
+    roots = list(dict.fromkeys(roots))  # Drop duplicates, keep order
     
-    updater = NvidiaDLSSUpdaterCLI()
+    updater = NvidiaDLSSUpdaterCLI(args.models_root, args.jobs, args.cache_dir,
+                                   not args.no_verify, args.allow_downgrade, args.target_glob,
+                                   roots, args.root_jobs, args.transactional)
+    if args.log_format == 'jsonl':
+        updater.event_log = JsonLinesLog(args.log_file)
+    if args.profile:
+        updater.profiler = PhaseProfiler()
+    profile = cProfile.Profile() if args.profile_out else None
     
     # If no arguments provided, run interactive mode
-    if len(sys.argv) == 1:
-        return updater.run_interactive()
-    else:
-        return updater.run_cli(args)
+    try:
+        if profile is not None:
+            profile.enable()
+        if len(sys.argv) == 1:
+            return updater.run_interactive()
+        else:
+            return updater.run_cli(args)
+    finally:
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(args.profile_out)
+        if updater.profiler is not None:
+            updater.print_profile()
+        updater.hash_cache.save()
+        if updater.event_log is not None:
+            updater.event_log.close()
 
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the backup retention policy and legacy backup GC
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dlss_backup_store
+from dlss_backup_store import BackupStore, select_expired
+from dlss_engine import DLSSUpdaterEngine
+
+NOW = datetime(2026, 1, 31, 12, 0, 0)
+
+
+def backups(*ages_and_sizes):
+    """Build (created, size, name) tuples from (age in days, size) pairs"""
+    return [(NOW - timedelta(days=age), size, f"backup-{age}d")
+            for age, size in ages_and_sizes]
+
+
+class SelectExpiredTest(unittest.TestCase):
+    def test_no_policy_keeps_everything(self):
+        self.assertEqual(select_expired(backups((1, 10), (5, 10)), now=NOW), [])
+
+    def test_keep_last(self):
+        expired = select_expired(backups((3, 10), (1, 10), (2, 10), (9, 10)), keep_last=2,
+                                 now=NOW)
+        self.assertEqual(sorted(expired), ["backup-3d", "backup-9d"])
+
+    def test_keep_days(self):
+        expired = select_expired(backups((1, 10), (6, 10), (8, 10)), keep_days=7, now=NOW)
+        self.assertEqual(expired, ["backup-8d"])
+
+    def test_keep_rules_are_combined(self):
+        # Kept when either rule keeps it
+        expired = select_expired(backups((1, 10), (2, 10), (30, 10), (40, 10)), keep_last=3,
+                                 keep_days=1.5, now=NOW)
+        self.assertEqual(expired, ["backup-40d"])
+
+    def test_max_bytes_trims_oldest_first(self):
+        expired = select_expired(backups((1, 40), (2, 40), (3, 40)), max_bytes=100, now=NOW)
+        self.assertEqual(expired, ["backup-3d"])
+
+    def test_max_bytes_applies_after_keep_rules(self):
+        expired = select_expired(backups((1, 60), (2, 60), (3, 60)), keep_last=2,
+                                 max_bytes=100, now=NOW)
+        self.assertEqual(sorted(expired), ["backup-2d", "backup-3d"])
+
+    def test_empty(self):
+        self.assertEqual(select_expired([], keep_last=1, keep_days=1, max_bytes=0, now=NOW), [])
+
+
+class LegacyBackupGCTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="dlss_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        self.files_path = os.path.join(self.temp_dir, "dlss", "versions", "1", "files")
+        os.makedirs(self.files_path)
+
+    def touch(self, name):
+        path = os.path.join(self.files_path, name)
+        with open(path, 'wb') as f:
+            f.write(b'backup')
+        return path
+
+    def test_impossible_timestamp_is_skipped(self):
+        old = self.touch("nvngx_dlss.bin.bak.20200101_000000")
+        bogus = self.touch("nvngx_dlss.bin.bak.20241399_000000")
+        results = DLSSUpdaterEngine(self.temp_dir).collect_garbage(keep_days=1)
+        removed = [path for result in results for path in result.removed]
+        self.assertEqual(removed, [old])
+        self.assertTrue(os.path.exists(bogus))
+
+
+class BackupStoreAddTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="dlss_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        files_path = os.path.join(self.temp_dir, "dlss", "versions", "1", "files")
+        os.makedirs(files_path)
+        self.target = os.path.join(files_path, "nvngx_dlss.bin")
+        with open(self.target, 'wb') as f:
+            f.write(b'original')
+        self.store = BackupStore(self.temp_dir)
+
+    def test_blob_stored_by_another_worker_is_reused(self):
+        digest = "ab" * 32
+        real_link = os.link
+
+        def link_after_other_worker(source, destination):
+            real_link(source, destination)  # The other worker wins the race
+            raise FileExistsError(destination)
+
+        with mock.patch.object(dlss_backup_store.os, "link", side_effect=link_after_other_worker):
+            entry, method = self.store.add(self.target, digest, "dlss", "1", move=True)
+        self.assertEqual(method, "existing")
+        self.assertTrue(os.path.exists(self.target))
+        self.assertEqual([e.sha256 for e in self.store.entries()], [entry.sha256])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for loading the hash cache file
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dlss_fileops import CancelToken, Cancelled
+from dlss_hash_cache import HashCache, file_digest
+
+
+class HashCacheLoadTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.path = os.path.join(self.temp_dir.name, "cache.json")
+
+    def load(self, text):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return HashCache(self.path)
+
+    def test_malformed_files_give_an_empty_cache(self):
+        for text in ('[1, 2]', '{"version": 1, "entries": [[1, 2]]}',
+                     '{"version": 1, "entries": [5]}', '{"version": 1, "entries": {"a": 1}}',
+                     'null', '{"version": 1', ''):
+            with self.subTest(text=text):
+                self.assertEqual(len(self.load(text)._entries), 0)
+
+    def test_round_trip(self):
+        data_path = os.path.join(self.temp_dir.name, "data.bin")
+        with open(data_path, 'wb') as f:
+            f.write(b'data' * 1000)
+        cache = HashCache(self.path)
+        cache.record(data_path, file_digest(data_path))
+        cache.save()
+        self.assertEqual(HashCache(self.path).lookup(data_path), file_digest(data_path))
+
+    def test_cancelled_digest_is_not_recorded(self):
+        data_path = os.path.join(self.temp_dir.name, "data.bin")
+        with open(data_path, 'wb') as f:
+            f.write(b'data' * 1000)
+        token = CancelToken()
+        token.cancel()
+        cache = HashCache(self.path)
+        with self.assertRaises(Cancelled):
+            cache.digest(data_path, token)
+        self.assertIsNone(cache.lookup(data_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the update journal and the engine's crash recovery
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import dlss_engine
+from dlss_engine import DLSSUpdaterEngine
+from dlss_hash_cache import file_digest
+from dlss_journal import Journal
+
+from synthetic_pe import write_pe
+
+INSTALLED_VERSION = (310, 1, 0, 0)
+SOURCE_VERSION = (310, 2, 0, 0)
+
+
+class RecoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="dlss_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        self.models_root = os.path.join(self.temp_dir, "models")
+        self.files_path = os.path.join(self.models_root, "dlss", "versions", "1", "files")
+        os.makedirs(self.files_path)
+        self.target = os.path.join(self.files_path, "nvngx_dlss.bin")
+        write_pe(self.target, INSTALLED_VERSION, 64 * 1024)
+        self.original_digest = file_digest(self.target)
+        self.source = os.path.join(self.temp_dir, "nvngx_dlss.dll")
+        write_pe(self.source, SOURCE_VERSION, 96 * 1024)
+        self.source_digest = file_digest(self.source)
+        self.staged = os.path.join(self.files_path, ".dlss_test.tmp")
+
+    def stage(self):
+        shutil.copyfile(self.source, self.staged)
+
+    def recover(self):
+        engine = DLSSUpdaterEngine(self.models_root)
+        return engine, [(result.action, result.error) for result in engine.recover()]
+
+    def assertJournalEmpty(self, engine):
+        self.assertEqual(engine.journal.pending(), [])
+        self.assertEqual(os.path.getsize(engine.journal.path), 0)
+
+    def test_nothing_to_recover(self):
+        engine, actions = self.recover()
+        self.assertEqual(actions, [])
+
+    def test_ready_staged_file_rolls_forward(self):
+        journal = Journal(self.models_root)
+        journal.begin(self.target, self.staged, self.source_digest)
+        self.stage()
+        journal.ready([self.target])
+
+        engine, actions = self.recover()
+        self.assertEqual(actions, [("rolled_forward", "")])
+        self.assertEqual(file_digest(self.target), self.source_digest)
+        self.assertFalse(os.path.exists(self.staged))
+        self.assertJournalEmpty(engine)
+
+    def test_half_written_staged_file_rolls_back(self):
+        Journal(self.models_root).begin(self.target, self.staged)
+        with open(self.staged, 'wb') as f:
+            f.write(b'torn')
+
+        engine, actions = self.recover()
+        self.assertEqual(actions, [("rolled_back", "")])
+        self.assertEqual(file_digest(self.target), self.original_digest)
+        self.assertFalse(os.path.exists(self.staged))
+        self.assertJournalEmpty(engine)
+
+    def test_original_moved_to_store_is_restored(self):
+        engine = DLSSUpdaterEngine(self.models_root)
+        journal = Journal(self.models_root)
+        journal.begin(self.target, self.staged)
+        self.stage()
+        journal.backup(self.target, self.original_digest)
+        blob_path = engine.backup_store.blob_path(self.original_digest)
+        os.makedirs(os.path.dirname(blob_path))
+        os.replace(self.target, blob_path)  # A crash right after the move
+
+        engine, actions = self.recover()
+        self.assertEqual(actions, [("rolled_back", "")])
+        self.assertEqual(file_digest(self.target), self.original_digest)
+        self.assertFalse(os.path.exists(self.staged))
+
+    def test_committed_but_not_closed_is_settled(self):
+        journal = Journal(self.models_root)
+        journal.begin(self.target, self.staged)
+        journal.ready([self.target])
+        shutil.copyfile(self.source, self.target)  # The rename happened
+
+        engine, actions = self.recover()
+        self.assertEqual(actions, [("settled", "")])
+        self.assertEqual(file_digest(self.target), self.source_digest)
+
+    def test_lost_original_without_backup_fails(self):
+        journal = Journal(self.models_root)
+        journal.begin(self.target, self.staged)
+        os.remove(self.target)
+
+        engine, actions = self.recover()
+        self.assertEqual([action for action, _ in actions], ["failed"])
+        self.assertEqual([entry.target_path for entry in engine.journal.pending()], [self.target])
+
+        # Still open, so the next start retries it
+        engine, actions = self.recover()
+        self.assertEqual([action for action, _ in actions], ["failed"])
+
+    def test_failed_entry_is_kept_while_others_are_cleared(self):
+        journal = Journal(self.models_root)
+        journal.begin(self.target, self.staged)
+        self.stage()
+        journal.ready([self.target])
+        lost = os.path.join(self.files_path, "nvngx_dlssd.bin")
+        journal.begin(lost, lost + ".tmp")
+        journal.backup(lost, "0" * 64)
+
+        engine, actions = self.recover()
+        self.assertEqual([action for action, _ in actions], ["rolled_forward", "failed"])
+        pending = engine.journal.pending()
+        self.assertEqual([entry.target_path for entry in pending], [lost])
+        self.assertEqual(pending[0].backup_sha256, "0" * 64)
+
+    def test_torn_record_is_ignored(self):
+        journal = Journal(self.models_root)
+        journal.begin(self.target, self.staged)
+        self.stage()
+        with open(journal.path, 'a', encoding='utf-8') as f:
+            f.write('{"op": "rea')  # The crash cut the ready record short
+
+        engine, actions = self.recover()
+        self.assertEqual(actions, [("rolled_back", "")])
+        self.assertEqual(file_digest(self.target), self.original_digest)
+
+    def test_crash_before_rename_is_completed_by_next_update(self):
+        engine = DLSSUpdaterEngine(self.models_root)
+        with mock.patch.object(dlss_engine, "commit", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                engine.update_single_dll("nvngx_dlss.dll", self.source)
+        self.assertEqual(file_digest(self.target), self.original_digest)
+
+        events = []
+        engine = DLSSUpdaterEngine(self.models_root, listener=lambda event: events.append(event.kind))
+        result = engine.update_single_dll("nvngx_dlss.dll", self.source)
+        self.assertIn("recovery_rolled_forward", events)
+        self.assertTrue(result.already_current)
+        self.assertEqual(os.listdir(self.files_path), ["nvngx_dlss.bin"])
+        self.assertJournalEmpty(engine)
+
+    def test_successful_update_leaves_journal_empty(self):
+        engine = DLSSUpdaterEngine(self.models_root)
+        self.assertTrue(engine.update_single_dll("nvngx_dlss.dll", self.source).success)
+        self.assertJournalEmpty(engine)
+
+
+if __name__ == "__main__":
+    unittest.main()
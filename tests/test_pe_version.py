@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for dlss_pe_version against synthetic PE fixtures
+"""
+
+import os
+import sys
+import struct
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from dlss_pe_version import (PEFormatError, _PEImage, format_version, parse_fixed_file_version,
+                             read_file_version)
+
+from synthetic_pe import FILE_ALIGNMENT, build_pe
+
+# Offset of the optional header in build_pe's images (DOS stub, PE signature, COFF header)
+OPTIONAL_OFFSET = 0x40 + 4 + 20
+
+
+def resource_directory_offset(pe32_plus):
+    """File offset of the resource entry of the data directory table"""
+    return OPTIONAL_OFFSET + (112 if pe32_plus else 96) + 8 * 2
+
+
+class ReadFileVersionTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def write(self, data, name="nvngx_dlss.dll"):
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_pe32_plus(self):
+        path = self.write(build_pe((310, 2, 1, 0), pe32_plus=True))
+        self.assertEqual(read_file_version(path), (310, 2, 1, 0))
+
+    def test_pe32(self):
+        path = self.write(build_pe((3, 7, 20, 5), pe32_plus=False))
+        self.assertEqual(read_file_version(path), (3, 7, 20, 5))
+
+    def test_trailing_filler_is_ignored(self):
+        path = self.write(build_pe((310, 4, 0, 0)) + b'\xCC' * (4 * 1024 * 1024))
+        self.assertEqual(read_file_version(path), (310, 4, 0, 0))
+
+    def test_no_resource_directory(self):
+        image = bytearray(build_pe())
+        struct.pack_into('<II', image, resource_directory_offset(True), 0, 0)
+        self.assertIsNone(read_file_version(self.write(bytes(image))))
+        with self.assertRaisesRegex(PEFormatError, "no resources"):
+            _PEImage(bytes(image)).version_resource()
+
+    def test_truncated_resource(self):
+        image = build_pe()
+        # Cut the file inside the VS_VERSIONINFO data of the .rsrc section
+        truncated = image[:FILE_ALIGNMENT + 0x60]
+        self.assertIsNone(read_file_version(self.write(truncated)))
+        with self.assertRaises(PEFormatError):
+            _PEImage(truncated).version_resource()
+
+    def test_truncated_fixed_file_info(self):
+        resource = _PEImage(build_pe()).version_resource()
+        with self.assertRaisesRegex(PEFormatError, "truncated"):
+            parse_fixed_file_version(resource[:48])
+
+    def test_not_a_pe_file(self):
+        self.assertIsNone(read_file_version(self.write(b"just some text\n" * 100)))
+        with self.assertRaisesRegex(PEFormatError, "MZ"):
+            _PEImage(b"just some text\n" * 100)
+
+    def test_mz_without_pe_signature(self):
+        data = b'MZ' + b'\0' * 0x3A + struct.pack('<I', 0x40) + b'NOPE' + b'\0' * 64
+        self.assertIsNone(read_file_version(self.write(data)))
+
+    def test_empty_and_missing_files(self):
+        self.assertIsNone(read_file_version(self.write(b"")))
+        self.assertIsNone(read_file_version(os.path.join(self.temp_dir.name, "missing.dll")))
+
+
+class FormatVersionTest(unittest.TestCase):
+    def test_format(self):
+        self.assertEqual(format_version((310, 2, 1, 0)), "310.2.1")
+        self.assertEqual(format_version((3, 7, 20, 5)), "3.7.20.5")
+        self.assertEqual(format_version(None), "unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
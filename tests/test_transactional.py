@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for all-or-nothing updates of several models
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import dlss_engine
+from dlss_engine import MODEL_MAP, DLSSUpdaterEngine
+from dlss_fileops import CancelToken, commit
+from dlss_hash_cache import file_digest
+
+from synthetic_pe import write_pe
+
+INSTALLED_VERSION = (310, 1, 0, 0)
+SOURCE_VERSION = (310, 2, 0, 0)
+
+
+class TransactionalUpdateTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp(prefix="dlss_test_")
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        self.models_root = os.path.join(self.temp_dir, "models")
+        source_dir = os.path.join(self.temp_dir, "source")
+        os.makedirs(source_dir)
+        self.sources = {}
+        self.targets = {}
+        for dll_name, model_name in MODEL_MAP.items():
+            files_path = os.path.join(self.models_root, model_name, "versions", "1", "files")
+            os.makedirs(files_path)
+            target = os.path.join(files_path, f"nvngx_{model_name}.bin")
+            write_pe(target, INSTALLED_VERSION, 64 * 1024)
+            self.targets[target] = file_digest(target)
+            self.sources[dll_name] = os.path.join(source_dir, dll_name)
+            write_pe(self.sources[dll_name], SOURCE_VERSION, 96 * 1024)
+        self.events = []
+        self.engine = DLSSUpdaterEngine(self.models_root, transactional=True,
+                                        listener=lambda event: self.events.append(event.kind))
+
+    def assertTargetsUntouched(self):
+        for target, digest in self.targets.items():
+            self.assertEqual(file_digest(target), digest, target)
+            self.assertEqual(os.listdir(os.path.dirname(target)), [os.path.basename(target)])
+        self.assertEqual(self.engine.journal.pending(), [])
+
+    def test_all_models_are_replaced(self):
+        results = self.engine.update_many(self.sources)
+        self.assertTrue(all(result.success for result in results))
+        self.assertIn("transaction_committed", self.events)
+        for target, digest in self.targets.items():
+            self.assertNotEqual(file_digest(target), digest)
+
+    def test_failure_before_commit_leaves_every_target_untouched(self):
+        write_pe(self.sources["nvngx_dlssg.dll"], (300, 0, 0, 0), 96 * 1024)  # A downgrade
+        results = self.engine.update_many(self.sources)
+        self.assertFalse(any(result.success for result in results))
+        self.assertEqual([result.error for result in results],
+                         ["transaction_aborted", "downgrade_refused", "transaction_aborted"])
+        self.assertIn("transaction_aborted", self.events)
+        self.assertTargetsUntouched()
+
+    def test_cancel_during_staging(self):
+        self.engine.cancel_token = token = CancelToken()
+        real_stage_copy = dlss_engine.stage_copy
+        calls = []
+
+        def cancel_on_second_copy(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 2:
+                token.cancel()
+            return real_stage_copy(*args, **kwargs)
+
+        with mock.patch.object(dlss_engine, "stage_copy", side_effect=cancel_on_second_copy):
+            results = self.engine.update_many(self.sources)
+        self.assertFalse(any(result.success for result in results))
+        self.assertEqual(results[1].error, "cancelled")
+        self.assertNotIn("transaction_committed", self.events)
+        self.assertTargetsUntouched()
+
+    def test_failed_rename_rolls_back_models_already_renamed(self):
+        calls = []
+
+        def fail_on_third_rename(staged_path, target_path):
+            calls.append(target_path)
+            if len(calls) == 3:
+                raise OSError("rename failed")
+            commit(staged_path, target_path)
+
+        with mock.patch.object(dlss_engine, "commit", side_effect=fail_on_third_rename):
+            results = self.engine.update_many(self.sources)
+        self.assertFalse(any(result.success for result in results))
+        self.assertEqual([result.rolled_back for result in results], [True, True, False])
+        self.assertEqual(self.events.count("rolled_back"), 2)
+        self.assertTargetsUntouched()
+
+
+if __name__ == "__main__":
+    unittest.main()